@@ -0,0 +1,193 @@
+"""
+In-process caches - bounded LRU mapping with optional TTL expiry
+"""
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with optional TTL expiry"""
+
+    def __init__(self, maxsize=1024, ttl=None, sliding=False, on_evict=None):
+        """
+        Initialize LRU cache
+
+        Args:
+            maxsize: Max number of entries (least recently used is evicted)
+            ttl: Seconds an entry stays valid (None = never expires)
+            sliding: If True, every access resets the entry's TTL
+            on_evict: Optional callback(key, value) for entries dropped by
+                      size or expiry (runs under the cache lock - keep it cheap)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sliding = sliding
+        self.on_evict = on_evict
+
+        # key -> (expires_at, value), ordered from least to most recently used
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expires_at(self):
+        return time.monotonic() + self.ttl if self.ttl is not None else None
+
+    def _is_expired(self, expires_at):
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def _lookup(self, key):
+        """Return (found, value); caller must hold the lock"""
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, value = entry
+        if self._is_expired(expires_at):
+            self._evict(key)
+            return False, None
+
+        self._data.move_to_end(key)
+        if self.sliding:
+            self._data[key] = (self._expires_at(), value)
+        return True, value
+
+    def get(self, key, default=None):
+        """Get value for key, or default if missing/expired"""
+        with self._lock:
+            found, value = self._lookup(key)
+        return value if found else default
+
+    def __getitem__(self, key):
+        with self._lock:
+            found, value = self._lookup(key)
+        if not found:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = (self._expires_at(), value)
+            self._data.move_to_end(key)
+            self._evict_overflow()
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key):
+        with self._lock:
+            found, _ = self._lookup(key)
+        return found
+
+    def __len__(self):
+        with self._lock:
+            self._purge_expired()
+            return len(self._data)
+
+    def __iter__(self):
+        with self._lock:
+            self._purge_expired()
+            return iter(list(self._data))
+
+    def get_or_set(self, key, factory):
+        """Return value for key, creating it with factory() if missing (atomic)"""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+            value = factory()
+            self._data[key] = (self._expires_at(), value)
+            self._evict_overflow()
+            return value
+
+    def pop(self, key, default=None):
+        """Remove key and return its value (or default)"""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                del self._data[key]
+        return value if found else default
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def _purge_expired(self):
+        """Drop expired entries; caller must hold the lock"""
+        if self.ttl is None:
+            return
+        expired = [k for k, (expires_at, _) in self._data.items() if self._is_expired(expires_at)]
+        for key in expired:
+            self._evict(key)
+
+    def _evict(self, key):
+        """Drop key and notify on_evict; caller must hold the lock"""
+        _, value = self._data.pop(key)
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def _evict_overflow(self):
+        """Drop least recently used entries beyond maxsize; caller must hold the lock"""
+        while len(self._data) > self.maxsize:
+            self._evict(next(iter(self._data)))
+
+
+class ShardedLRUCache:
+    """LRUCache split into independently locked shards by key hash"""
+
+    def __init__(self, shards=16, maxsize=1024, ttl=None, sliding=False, on_evict=None):
+        """
+        Initialize sharded cache
+
+        Args:
+            shards: Number of shards (each has its own lock)
+            maxsize: Max number of entries across all shards
+            ttl: Seconds an entry stays valid (None = never expires)
+            sliding: If True, every access resets the entry's TTL
+            on_evict: Optional callback(key, value) for evicted/expired entries
+        """
+        per_shard = max(1, -(-maxsize // shards))
+        self._shards = [
+            LRUCache(maxsize=per_shard, ttl=ttl, sliding=sliding, on_evict=on_evict)
+            for _ in range(shards)
+        ]
+
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key, default=None):
+        """Get value for key, or default if missing/expired"""
+        return self._shard(key).get(key, default)
+
+    def get_or_set(self, key, factory):
+        """Return value for key, creating it with factory() if missing (atomic)"""
+        return self._shard(key).get_or_set(key, factory)
+
+    def __getitem__(self, key):
+        return self._shard(key)[key]
+
+    def __setitem__(self, key, value):
+        self._shard(key)[key] = value
+
+    def __delitem__(self, key):
+        del self._shard(key)[key]
+
+    def __contains__(self, key):
+        return key in self._shard(key)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def __iter__(self):
+        return chain.from_iterable(list(shard) for shard in self._shards)
+
+    def pop(self, key, default=None):
+        """Remove key and return its value (or default)"""
+        return self._shard(key).pop(key, default)
+
+    def clear(self):
+        """Remove all entries"""
+        for shard in self._shards:
+            shard.clear()
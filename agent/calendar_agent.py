@@ -1,19 +1,68 @@
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone, date as date_type
+from functools import lru_cache
+import asyncio
 import os
 import logging
+import httplib2
+import threading
 
 logger = logging.getLogger(__name__)
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Refresh access tokens this long before they expire
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+# Retry delay (seconds) after a failed background refresh
+TOKEN_REFRESH_RETRY = 60
+# Socket timeout (seconds) for Calendar API calls
+HTTP_TIMEOUT = 30
+# Max requests per batch HTTP call (Calendar API recommends <= 50)
+BATCH_SIZE = 50
+# Reminder block sent with every new event (shared, never mutated)
+EVENT_REMINDERS = {
+    'useDefault': False,
+    'overrides': [
+        {'method': 'popup', 'minutes': 30},
+    ],
+}
+
+@lru_cache(maxsize=1024)
+def _parse_date(date):
+    """Parse YYYY-MM-DD (memoized - the same few dates recur constantly)"""
+    return date_type.fromisoformat(date)
+
+@lru_cache(maxsize=1024)
+def _parse_datetime(date, time):
+    """Parse YYYY-MM-DD + HH:MM (memoized)"""
+    return datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+
+def _format_start(start):
+    """
+    Format an API start value as 'YYYY-MM-DD HH:MM'
+    
+    The API returns canonical RFC 3339 strings, so slicing gives the same
+    wall-clock result as parsing. All-day events only carry a date.
+    """
+    if len(start) > 10:
+        return f"{start[:10]} {start[11:16]}"
+    return f"{start} 00:00"
+
 class CalendarAgent:
     """Google Calendar Agent for CRUD operations"""
     
+    # Credentials and API clients shared by every instance,
+    # keyed by (credentials_path, token_path)
+    _creds_cache = {}
+    _service_cache = {}
+    _refresh_timers = {}
+    # Open instances per key - the shared refresh timer stops with the last one
+    _open_counts = {}
+    _cache_lock = threading.Lock()
+    
     def __init__(self, credentials_path='credentials/credentials.json', 
                  token_path='credentials/token.json',
                  timezone='Asia/Jakarta'):
@@ -28,40 +77,225 @@ class CalendarAgent:
         self.credentials_path = credentials_path
         self.token_path = token_path
         self.timezone = timezone
+        self.creds = None
         self.service = None
+        self._local = threading.local()
+        self._open = False
         self.authenticate()
     
+    @classmethod
+    def clear_cache(cls):
+        """Drop all cached credentials and API clients"""
+        with cls._cache_lock:
+            for timer in cls._refresh_timers.values():
+                timer.cancel()
+            cls._refresh_timers.clear()
+            cls._open_counts.clear()
+            cls._creds_cache.clear()
+            cls._service_cache.clear()
+    
+    @property
+    def _cache_key(self):
+        return (self.credentials_path, self.token_path)
+    
+    def _mark_open(self):
+        """Count this instance as a user of the shared refresh timer (lock held)"""
+        if not self._open:
+            CalendarAgent._open_counts[self._cache_key] = CalendarAgent._open_counts.get(self._cache_key, 0) + 1
+            self._open = True
+    
     def authenticate(self):
         """Authenticate with Google Calendar API"""
-        creds = None
+        cache_key = self._cache_key
         
-        # Check if token.json exists
-        if os.path.exists(self.token_path):
-            creds = Credentials.from_authorized_user_file(self.token_path, SCOPES)
-        
-        # If no valid credentials, authenticate
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                if not os.path.exists(self.credentials_path):
-                    raise FileNotFoundError(
-                        f"Credentials file not found: {self.credentials_path}\n"
-                        "Download from Google Cloud Console"
+        with CalendarAgent._cache_lock:
+            # Reuse in-memory credentials if still valid
+            creds = CalendarAgent._creds_cache.get(cache_key)
+            if creds and creds.valid and cache_key in CalendarAgent._service_cache:
+                self.creds = creds
+                self.service = CalendarAgent._service_cache[cache_key]
+                self._mark_open()
+                logger.info("✅ Google Calendar authenticated (cached)")
+                return
+            
+            creds = None
+            
+            # Check if token.json exists
+            if os.path.exists(self.token_path):
+                creds = Credentials.from_authorized_user_file(self.token_path, SCOPES)
+            
+            # If no valid credentials, authenticate
+            if not creds or not creds.valid:
+                if creds and creds.expired and creds.refresh_token:
+                    creds.refresh(Request())
+                else:
+                    if not os.path.exists(self.credentials_path):
+                        raise FileNotFoundError(
+                            f"Credentials file not found: {self.credentials_path}\n"
+                            "Download from Google Cloud Console"
+                        )
+                    # Only needed for first-time login
+                    from google_auth_oauthlib.flow import InstalledAppFlow
+                    flow = InstalledAppFlow.from_client_secrets_file(
+                        self.credentials_path, SCOPES
                     )
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.credentials_path, SCOPES
-                )
-                creds = flow.run_local_server(port=0)
+                    creds = flow.run_local_server(port=0)
+                
+                # Save credentials
+                self._save_token(creds)
+            
+            # Imported here - the discovery client is slow to import
+            from googleapiclient.discovery import build
+            
+            self.creds = creds
+            self.service = build('calendar', 'v3', http=self._build_http(creds))
             
-            # Save credentials
-            os.makedirs(os.path.dirname(self.token_path), exist_ok=True)
-            with open(self.token_path, 'w') as token:
-                token.write(creds.to_json())
+            CalendarAgent._creds_cache[cache_key] = creds
+            CalendarAgent._service_cache[cache_key] = self.service
+            self._mark_open()
         
-        self.service = build('calendar', 'v3', credentials=creds)
+        self._schedule_refresh()
         logger.info("✅ Google Calendar authenticated")
     
+    def _build_http(self, creds):
+        """
+        Build the authorized transport for the API client
+        
+        A single httplib2.Http keeps its HTTPS connection to googleapis.com
+        alive between calls, so only the first request pays for the TLS
+        handshake.
+        """
+        return AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+    
+    def _thread_http(self):
+        """
+        Authorized transport for the calling thread
+        
+        httplib2.Http is not thread-safe, so each thread (e.g. the workers
+        behind the *_async methods) gets and keeps its own connection.
+        """
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._build_http(self.creds)
+            self._local.http = http
+        return http
+    
+    def _execute(self, request):
+        """Execute an API request on the calling thread's transport"""
+        return request.execute(http=self._thread_http())
+    
+    def warm_up(self) -> bool:
+        """
+        Make one cheap API call so startup pays for discovery/TLS/token checks
+        
+        Also surfaces revoked or broken credentials at launch instead of on a
+        user's first calendar request.
+        
+        Returns:
+            bool: True if the Calendar API answered
+        """
+        try:
+            self._execute(self.service.calendarList().list(maxResults=1))
+            logger.info("🔥 Calendar API connection warmed up")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Calendar warm-up failed: {e}")
+            return False
+    
+    def _save_token(self, creds):
+        """
+        Write token.json atomically (temp file + fsync + rename)
+        
+        Skips the write entirely when the serialized token is unchanged.
+        
+        Returns:
+            bool: True if the file was written
+        """
+        new_json = creds.to_json()
+        
+        try:
+            with open(self.token_path, 'r') as token:
+                if token.read() == new_json:
+                    return False
+        except OSError:
+            pass
+        
+        token_dir = os.path.dirname(self.token_path)
+        if token_dir:
+            os.makedirs(token_dir, exist_ok=True)
+        
+        tmp_path = self.token_path + '.tmp'
+        with open(tmp_path, 'wb') as token:
+            token.write(new_json.encode('utf-8'))
+            token.flush()
+            os.fsync(token.fileno())
+        os.replace(tmp_path, self.token_path)
+        return True
+    
+    def _schedule_refresh(self, delay=None):
+        """
+        Schedule a background token refresh shortly before expiry
+        
+        Does nothing once every instance sharing these credentials is closed.
+        
+        Args:
+            delay: Seconds until refresh (default: computed from creds.expiry)
+        """
+        creds = self.creds
+        if delay is None:
+            expiry = getattr(creds, 'expiry', None)
+            if not isinstance(expiry, datetime) or not getattr(creds, 'refresh_token', None):
+                return
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            delay = max((expiry - now - TOKEN_REFRESH_MARGIN).total_seconds(), 0)
+        
+        timer = threading.Timer(delay, self._refresh_token)
+        timer.daemon = True
+        
+        with CalendarAgent._cache_lock:
+            # Every instance closed (possibly while a refresh was running)
+            if self._cache_key not in CalendarAgent._open_counts:
+                return
+            old_timer = CalendarAgent._refresh_timers.pop(self._cache_key, None)
+            if old_timer:
+                old_timer.cancel()
+            CalendarAgent._refresh_timers[self._cache_key] = timer
+        
+        timer.start()
+    
+    def _refresh_token(self):
+        """Refresh the access token and persist it (runs on timer thread)"""
+        try:
+            # Network call - other instances must not wait on the lock for it
+            self.creds.refresh(Request())
+            with CalendarAgent._cache_lock:
+                CalendarAgent._creds_cache[self._cache_key] = self.creds
+                self._save_token(self.creds)
+            logger.info("🔄 Google Calendar token refreshed")
+        except Exception as e:
+            logger.error(f"Token refresh error: {e}")
+            self._schedule_refresh(delay=TOKEN_REFRESH_RETRY)
+            return
+        
+        self._schedule_refresh()
+    
+    def close(self):
+        """Stop the background token refresh once no other instance shares it"""
+        with CalendarAgent._cache_lock:
+            if not self._open:
+                return
+            self._open = False
+            
+            remaining = CalendarAgent._open_counts.get(self._cache_key, 1) - 1
+            if remaining > 0:
+                CalendarAgent._open_counts[self._cache_key] = remaining
+                return
+            
+            CalendarAgent._open_counts.pop(self._cache_key, None)
+            timer = CalendarAgent._refresh_timers.pop(self._cache_key, None)
+        if timer:
+            timer.cancel()
+    
     def create_event(self, title, date, time, duration=60, description=""):
         """
         CREATE - Create new event
@@ -74,7 +308,7 @@ class CalendarAgent:
             description: Event description
         """
         try:
-            start_datetime = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+            start_datetime = _parse_datetime(date, time)
             end_datetime = start_datetime + timedelta(minutes=duration)
             
             event = {
@@ -88,18 +322,15 @@ class CalendarAgent:
                     'dateTime': end_datetime.isoformat(),
                     'timeZone': self.timezone,
                 },
-                'reminders': {
-                    'useDefault': False,
-                    'overrides': [
-                        {'method': 'popup', 'minutes': 30},
-                    ],
-                },
+                'reminders': EVENT_REMINDERS,
             }
             
-            result = self.service.events().insert(
-                calendarId='primary',
-                body=event
-            ).execute()
+            result = self._execute(
+                self.service.events().insert(
+                    calendarId='primary',
+                    body=event
+                )
+            )
             
             return {
                 'success': True,
@@ -109,7 +340,7 @@ class CalendarAgent:
             }
             
         except Exception as e:
-            logger.error(f"Create event error: {e}")
+            logger.error(f"Create event error: {e}", exc_info=not isinstance(e, HttpError))
             return {
                 'success': False,
                 'message': f"❌ Error creating event: {str(e)}"
@@ -125,20 +356,24 @@ class CalendarAgent:
         """
         try:
             if date:
-                time_min = datetime.strptime(date, "%Y-%m-%d").isoformat() + 'Z'
-                time_max = (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)).isoformat() + 'Z'
+                day = _parse_date(date)
+                time_min = f"{day.isoformat()}T00:00:00Z"
+                time_max = f"{(day + timedelta(days=1)).isoformat()}T00:00:00Z"
             else:
-                time_min = datetime.now().isoformat() + 'Z'
-                time_max = (datetime.now() + timedelta(days=days)).isoformat() + 'Z'
-            
-            events_result = self.service.events().list(
-                calendarId='primary',
-                timeMin=time_min,
-                timeMax=time_max,
-                maxResults=20,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+                now = datetime.now()
+                time_min = now.isoformat() + 'Z'
+                time_max = (now + timedelta(days=days)).isoformat() + 'Z'
+            
+            events_result = self._execute(
+                self.service.events().list(
+                    calendarId='primary',
+                    timeMin=time_min,
+                    timeMax=time_max,
+                    maxResults=20,
+                    singleEvents=True,
+                    orderBy='startTime'
+                )
+            )
             
             events = events_result.get('items', [])
             
@@ -149,19 +384,20 @@ class CalendarAgent:
                     'message': "📅 No events found for this period."
                 }
             
-            message = f"📅 **Found {len(events)} event(s):**\n\n"
+            parts = [f"📅 **Found {len(events)} event(s):**\n\n"]
             for idx, event in enumerate(events, 1):
                 start = event['start'].get('dateTime', event['start'].get('date'))
-                start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
                 
-                message += f"**{idx}. {event['summary']}**\n"
-                message += f"   🕐 {start_dt.strftime('%Y-%m-%d %H:%M')}\n"
+                parts.append(f"**{idx}. {event['summary']}**\n")
+                parts.append(f"   🕐 {_format_start(start)}\n")
                 
                 if event.get('description'):
                     desc = event['description'][:100]
-                    message += f"   📝 {desc}{'...' if len(event['description']) > 100 else ''}\n"
+                    parts.append(f"   📝 {desc}{'...' if len(event['description']) > 100 else ''}\n")
                 
-                message += f"   🆔 `{event['id']}`\n\n"
+                parts.append(f"   🆔 `{event['id']}`\n\n")
+            
+            message = "".join(parts)
             
             return {
                 'success': True,
@@ -170,7 +406,7 @@ class CalendarAgent:
             }
             
         except Exception as e:
-            logger.error(f"Read events error: {e}")
+            logger.error(f"Read events error: {e}", exc_info=not isinstance(e, HttpError))
             return {
                 'success': False,
                 'message': f"❌ Error reading events: {str(e)}"
@@ -180,39 +416,14 @@ class CalendarAgent:
         """
         UPDATE - Update event
         
+        Sends only the changed fields via events().patch (no fetch first).
+        
         Args:
             event_id: Event ID
             **kwargs: Fields to update (title, date, time, duration, description)
         """
         try:
-            event = self.service.events().get(
-                calendarId='primary',
-                eventId=event_id
-            ).execute()
-            
-            # Update fields
-            if 'title' in kwargs:
-                event['summary'] = kwargs['title']
-            
-            if 'description' in kwargs:
-                event['description'] = kwargs['description']
-            
-            if 'date' in kwargs and 'time' in kwargs:
-                start_datetime = datetime.strptime(
-                    f"{kwargs['date']} {kwargs['time']}",
-                    "%Y-%m-%d %H:%M"
-                )
-                event['start']['dateTime'] = start_datetime.isoformat()
-                
-                if 'duration' in kwargs:
-                    end_datetime = start_datetime + timedelta(minutes=kwargs['duration'])
-                    event['end']['dateTime'] = end_datetime.isoformat()
-            
-            updated_event = self.service.events().update(
-                calendarId='primary',
-                eventId=event_id,
-                body=event
-            ).execute()
+            updated_event = self._execute(self._patch_request(event_id, kwargs))
             
             return {
                 'success': True,
@@ -225,38 +436,48 @@ class CalendarAgent:
                     'success': False,
                     'message': f"❌ Event with ID `{event_id}` not found."
                 }
+            logger.error(f"Update event error: {error}")
             return {
                 'success': False,
                 'message': f"❌ Error updating event: {str(error)}"
             }
         except Exception as e:
-            logger.error(f"Update event error: {e}")
+            logger.error(f"Update event error: {e}", exc_info=True)
             return {
                 'success': False,
                 'message': f"❌ Error: {str(e)}"
             }
     
-    def delete_event(self, event_id):
+    def delete_event(self, event_id, echo_title=False):
         """
         DELETE - Delete event
         
         Args:
             event_id: Event ID
+            echo_title: If True, fetch the event first so the reply can show
+                its title (one extra API call). By default delete directly.
         """
         try:
-            # Get event info before deleting
-            event = self.service.events().get(
-                calendarId='primary',
-                eventId=event_id
-            ).execute()
-            
-            event_title = event.get('summary', 'Unknown')
+            event_title = None
+            if echo_title:
+                # Get event info before deleting
+                event = self._execute(
+                    self.service.events().get(
+                        calendarId='primary',
+                        eventId=event_id
+                    )
+                )
+                
+                event_title = event.get('summary', 'Unknown')
             
             # Delete
-            self.service.events().delete(
-                calendarId='primary',
-                eventId=event_id
-            ).execute()
+            self._execute(self._delete_request(event_id))
+            
+            if event_title is None:
+                return {
+                    'success': True,
+                    'message': f"🗑️ **Event deleted!**\n\n🆔 **ID:** `{event_id}`"
+                }
             
             return {
                 'success': True,
@@ -269,13 +490,197 @@ class CalendarAgent:
                     'success': False,
                     'message': f"❌ Event with ID `{event_id}` not found."
                 }
+            logger.error(f"Delete event error: {error}")
             return {
                 'success': False,
                 'message': f"❌ Error deleting event: {str(error)}"
             }
         except Exception as e:
-            logger.error(f"Delete event error: {e}")
+            logger.error(f"Delete event error: {e}", exc_info=True)
             return {
                 'success': False,
                 'message': f"❌ Error: {str(e)}"
-            }
\ No newline at end of file
+            }
+    
+    def _execute_batch(self, requests):
+        """
+        Send requests through batch HTTP calls (BATCH_SIZE per call)
+        
+        Every batch is assembled before the first one is sent, so a bad
+        request (e.g. a repeated request_id) fails before anything changes.
+        
+        Args:
+            requests: List of (request_id, HttpRequest) tuples, unique request_ids
+        
+        Returns:
+            tuple: (responses dict, errors dict) keyed by request_id
+        """
+        responses = {}
+        errors = {}
+        
+        def callback(request_id, response, exception):
+            if exception is not None:
+                errors[request_id] = exception
+            else:
+                responses[request_id] = response
+        
+        batches = []
+        for i in range(0, len(requests), BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=callback)
+            for request_id, request in requests[i:i + BATCH_SIZE]:
+                batch.add(request, request_id=request_id)
+            batches.append(batch)
+        
+        for batch in batches:
+            batch.execute(http=self._thread_http())
+        
+        return responses, errors
+    
+    def _format_batch_errors(self, errors):
+        """Format per-event batch errors as message lines"""
+        lines = []
+        for event_id, error in errors.items():
+            if isinstance(error, HttpError) and error.resp.status == 404:
+                lines.append(f"❌ `{event_id}`: not found")
+            else:
+                lines.append(f"❌ `{event_id}`: {str(error)}")
+        return lines
+    
+    def delete_events(self, event_ids):
+        """
+        DELETE - Delete several events in batched HTTP calls
+        
+        Args:
+            event_ids: List of event IDs (repeats are deleted once)
+        """
+        try:
+            event_ids = list(dict.fromkeys(event_ids))
+            requests = [(event_id, self._delete_request(event_id)) for event_id in event_ids]
+            
+            responses, errors = self._execute_batch(requests)
+            deleted = [event_id for event_id in event_ids if event_id in responses]
+            
+            message = f"🗑️ **Deleted {len(deleted)} event(s)!**\n"
+            message += "".join(f"\n🆔 `{event_id}`" for event_id in deleted)
+            if errors:
+                message += "\n\n" + "\n".join(self._format_batch_errors(errors))
+            
+            return {
+                'success': not errors,
+                'deleted': deleted,
+                'failed': {event_id: str(error) for event_id, error in errors.items()},
+                'message': message
+            }
+            
+        except Exception as e:
+            logger.error(f"Batch delete error: {e}", exc_info=not isinstance(e, HttpError))
+            return {
+                'success': False,
+                'message': f"❌ Error deleting events: {str(e)}"
+            }
+    
+    def update_events(self, updates):
+        """
+        UPDATE - Update several events in batched HTTP calls
+        
+        Uses events().patch so no per-event fetch is needed.
+        
+        Args:
+            updates: List of dicts with 'event_id' plus fields to update
+                     (title, date, time, duration, description); updates of
+                     the same event are merged, later fields winning
+        """
+        try:
+            merged = {}
+            for update in updates:
+                fields = dict(update)
+                event_id = fields.pop('event_id')
+                merged.setdefault(event_id, {}).update(fields)
+            
+            requests = [
+                (event_id, self._patch_request(event_id, fields))
+                for event_id, fields in merged.items()
+            ]
+            
+            responses, errors = self._execute_batch(requests)
+            
+            message = f"✅ **Updated {len(responses)} event(s)!**\n"
+            for event_id, event in responses.items():
+                message += f"\n📝 {event.get('summary', 'Unknown')} (`{event_id}`)"
+            if errors:
+                message += "\n\n" + "\n".join(self._format_batch_errors(errors))
+            
+            return {
+                'success': not errors,
+                'updated': list(responses),
+                'failed': {event_id: str(error) for event_id, error in errors.items()},
+                'message': message
+            }
+            
+        except Exception as e:
+            logger.error(f"Batch update error: {e}", exc_info=not isinstance(e, HttpError))
+            return {
+                'success': False,
+                'message': f"❌ Error updating events: {str(e)}"
+            }
+    
+    def _delete_request(self, event_id):
+        """events().delete request (shared by delete_event and delete_events)"""
+        return self.service.events().delete(
+            calendarId='primary',
+            eventId=event_id
+        )
+    
+    def _patch_request(self, event_id, fields):
+        """events().patch request (shared by update_event and update_events)"""
+        return self.service.events().patch(
+            calendarId='primary',
+            eventId=event_id,
+            body=self._build_patch_body(**fields)
+        )
+    
+    def _build_patch_body(self, **kwargs):
+        """Build a partial event body for events().patch"""
+        body = {}
+        
+        if 'title' in kwargs:
+            body['summary'] = kwargs['title']
+        
+        if 'description' in kwargs:
+            body['description'] = kwargs['description']
+        
+        if 'date' in kwargs and 'time' in kwargs:
+            start_datetime = _parse_datetime(kwargs['date'], kwargs['time'])
+            body['start'] = {
+                'dateTime': start_datetime.isoformat(),
+                'timeZone': self.timezone,
+            }
+            
+            if 'duration' in kwargs:
+                end_datetime = start_datetime + timedelta(minutes=kwargs['duration'])
+                body['end'] = {
+                    'dateTime': end_datetime.isoformat(),
+                    'timeZone': self.timezone,
+                }
+        
+        return body
+    
+    # ====================
+    # ASYNC VARIANTS
+    # ====================
+    
+    async def create_event_async(self, *args, **kwargs):
+        """Async create_event (runs in a worker thread)"""
+        return await asyncio.to_thread(self.create_event, *args, **kwargs)
+    
+    async def read_events_async(self, *args, **kwargs):
+        """Async read_events (runs in a worker thread)"""
+        return await asyncio.to_thread(self.read_events, *args, **kwargs)
+    
+    async def update_event_async(self, *args, **kwargs):
+        """Async update_event (runs in a worker thread)"""
+        return await asyncio.to_thread(self.update_event, *args, **kwargs)
+    
+    async def delete_event_async(self, *args, **kwargs):
+        """Async delete_event (runs in a worker thread)"""
+        return await asyncio.to_thread(self.delete_event, *args, **kwargs)
@@ -1,55 +1,124 @@
 import os
 import google.generativeai as genai
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
+from functools import lru_cache
+import asyncio
 import json
 import logging
+import re
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator
+from agent.cache import LRUCache, ShardedLRUCache
+from agent.tools import calendar_tools
 
 logger = logging.getLogger(__name__)
 
-class LLMAgent:
-    """LLM Agent using Google Gemini with Function Calling"""
-    
-    def __init__(self, api_key: str, model_name: str = "gemini-2.0-flash-exp", 
-                 enable_calendar: bool = False):
-        """
-        Initialize LLM Agent
-        
-        Args:
-            api_key: Google Gemini API key
-            model_name: Model to use
-            enable_calendar: Enable calendar tools (requires calendar_agent)
-        """
-        self.api_key = api_key
-        self.model_name = model_name
-        self.enable_calendar = enable_calendar
-        
-        # Configure Gemini
-        genai.configure(api_key=self.api_key)
-        
-        # System prompt with calendar awareness
-        self.system_prompt = self._build_system_prompt()
-        
-        # Setup tools
-        self.tools = None
-        if self.enable_calendar:
-            self.tools = self._setup_calendar_tools()
-        
-        # Initialize model with tools
-        self.model = genai.GenerativeModel(
-            model_name=self.model_name,
-            tools=self.tools,
-            system_instruction=self.system_prompt
-        )
-        
-        # Chat history storage
-        self.chat_sessions = {}
-        
-        logger.info(f"✅ LLM Agent initialized (Calendar: {'ON' if enable_calendar else 'OFF'})")
+# Chat session limits (idle sessions are dropped after SESSION_TTL seconds)
+MAX_SESSIONS = 10_000
+SESSION_TTL = 3600
+SESSION_SHARDS = 16
+# Sync per-user turn locks are striped over this many locks (bounded memory)
+SESSION_LOCK_STRIPES = 64
+# Messages kept in a chat's history (older turns are dropped after each turn)
+MAX_HISTORY_MESSAGES = 40
+
+# Max Gemini calls / tool runs in flight at once from aprocess() and aprocess_stream()
+MAX_CONCURRENT_REQUESTS = 32
+
+# Worker threads for running independent tool calls of one turn in parallel
+TOOL_WORKERS = 8
+# Tools that never modify the calendar
+READ_ONLY_FUNCTIONS = frozenset({'list_calendar_events'})
+
+# Prefetch a read-only tool call alongside the Gemini request once a prompt has
+# led to the same call at least SPECULATION_MIN_SAMPLES times with this confidence.
+# A prompt whose prefetch turned out wrong is never prefetched again.
+SPECULATION_MIN_SAMPLES = 3
+SPECULATION_MIN_CONFIDENCE = 0.8
+
+# Max prompts whose tool call history is kept for speculation
+PATTERN_CACHE_SIZE = 2048
+
+# Gemini context cache lifetime for the system prompt + tool schema (refreshed before expiry)
+CONTEXT_CACHE_TTL = timedelta(hours=1)
+CONTEXT_CACHE_REFRESH = timedelta(minutes=50)
+
+_WORD_RE = re.compile(r"\w+")
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_RELATIVE_DATE_RE = re.compile(r"^today([+-]\d+)$")
+
+# Greetings / thanks that never need a tool; a message made up only of these
+# words is answered with function calling disabled
+_SMALL_TALK_WORDS = frozenset({
+    'halo', 'hallo', 'hai', 'hi', 'hello', 'hey', 'selamat', 'pagi', 'siang',
+    'sore', 'malam', 'makasih', 'makasi', 'terima', 'kasih', 'thanks', 'thank',
+    'you', 'thx', 'ok', 'oke', 'okay', 'sip', 'mantap', 'bye', 'dadah', 'ya',
+    'yaa', 'kak', 'bro', 'bot', 'banyak', 'much', 'so',
+})
+NO_TOOLS_CONFIG = {'function_calling_config': {'mode': 'NONE'}}
+
+def _normalize_message(message: str) -> str:
+    """Case/punctuation-insensitive key for a prompt ("Apa kabar?" == "apa kabar")"""
+    return " ".join(_WORD_RE.findall(message.lower()))
+
+def _can_run_parallel(function_calls) -> bool:
+    """
+    True if the calls of one turn are independent
     
-    def _build_system_prompt(self) -> str:
-        """Build system prompt based on capabilities"""
-        
-        base_prompt = """Kamu adalah asisten AI yang helpful dan friendly.
+    Reads mixed with writes run in order (a list must see a preceding add/delete),
+    as do writes that target the same event.
+    """
+    writes = [fc for fc in function_calls if fc.get('name') not in READ_ONLY_FUNCTIONS]
+    if not writes:
+        return True
+    if len(writes) < len(function_calls):
+        return False
+    event_ids = [event_id for fc in writes for event_id in _target_event_ids(fc) if event_id]
+    return len(event_ids) == len(set(event_ids))
+
+def _target_event_ids(fc_dict) -> list:
+    """Event IDs a write call touches (single and batch tools)"""
+    args = fc_dict.get('args', {})
+    if 'event_ids' in args:
+        return list(args['event_ids'])
+    if 'updates' in args:
+        return [dict(update).get('event_id') for update in args['updates']]
+    return [args.get('event_id')]
+
+def _call_key(fc_dict):
+    """Hashable identity of a function call (name + canonical args)"""
+    return fc_dict.get('name'), json.dumps(dict(fc_dict.get('args', {})), sort_keys=True, default=str)
+
+def _relative_args(args: dict, today: date) -> dict:
+    """Replace YYYY-MM-DD values with "today+N" so a daily prompt keeps one pattern"""
+    relative = {}
+    for key, value in args.items():
+        if isinstance(value, str) and _ISO_DATE_RE.match(value):
+            try:
+                value = f"today{(date.fromisoformat(value) - today).days:+d}"
+            except ValueError:
+                pass
+        relative[key] = value
+    return relative
+
+def _absolute_args(args: dict, today: date) -> dict:
+    """Inverse of _relative_args"""
+    absolute = {}
+    for key, value in args.items():
+        match = _RELATIVE_DATE_RE.match(value) if isinstance(value, str) else None
+        if match:
+            value = (today + timedelta(days=int(match.group(1)))).isoformat()
+        absolute[key] = value
+    return absolute
+
+NO_RESPONSE_MESSAGE = "Maaf, saya tidak bisa memproses permintaan ini. Bisa ulangi dengan cara lain?"
+
+# System prompt templates (dates are filled in per day by _render_system_prompt)
+_PROMPT_HEAD = """Kamu adalah asisten AI yang helpful dan friendly.
 
 PERSONALITY:
 - Ramah, santai, tapi profesional
@@ -57,9 +126,8 @@ PERSONALITY:
 - Jawab dalam Bahasa Indonesia yang natural
 
 CAPABILITIES:"""
-        
-        if self.enable_calendar:
-            base_prompt += """
+
+_PROMPT_CALENDAR = """
 - Chat biasa untuk pertanyaan umum
 - **Manage Google Calendar** menggunakan tools yang tersedia
 
@@ -76,6 +144,8 @@ TOOLS AVAILABLE:
 2. list_calendar_events - List events  
 3. delete_calendar_event - Delete event
 4. update_calendar_event - Update event
+5. update_calendar_events - Update several events at once
+6. delete_calendar_events - Delete several events at once
 
 DATE/TIME RULES:
 - "hari ini" = {today}
@@ -91,162 +161,316 @@ User: "tambahkan jadwal besok jam 2"
 User: "apa jadwalku hari ini?"
 → USE: list_calendar_events(date="{today}")
 """
-        else:
-            base_prompt += """
+
+_PROMPT_CHAT_ONLY = """
 - Chat untuk pertanyaan umum
 - Membantu brainstorming
 - Memberikan penjelasan dan tips
 """
-        
-        base_prompt += """
+
+_PROMPT_TAIL = """
 
 RESPONSE STYLE:
 - Natural dan informatif
 - Konfirmasi detail setelah execute tool
 """
+
+_TEMPLATE_CAL = _PROMPT_HEAD + _PROMPT_CALENDAR + _PROMPT_TAIL
+_TEMPLATE_NOCAL = _PROMPT_HEAD + _PROMPT_CHAT_ONLY + _PROMPT_TAIL
+
+# !cal intent prompt (dates filled in per day by _render_intent_prompt)
+_INTENT_TEMPLATE = """Ubah perintah kalender menjadi SATU objek JSON, tanpa teks lain.
+
+ACTIONS:
+- create: {{"action": "create", "title": str, "date": "YYYY-MM-DD", "time": "HH:MM", "duration": menit, "description": str}}
+- read: {{"action": "read", "date": "YYYY-MM-DD" atau null, "days": int}}
+- update: {{"action": "update", "event_id": str, lalu hanya field yang berubah (title, date, time, duration, description)}}
+- delete: {{"action": "delete", "event_id": str}}
+
+DATE/TIME RULES:
+- "hari ini" = {today}
+- "besok" = {tomorrow}
+- "lusa" = {day_after_tomorrow}
+- "pagi"=09:00, "siang"=12:00, "sore"=15:00, "malam"=19:00
+- "jam 2" = 14:00
+- duration default 60, days default 7
+
+Jika perintah tidak jelas atau bukan perintah kalender, balas {{"action": null}}.
+"""
+
+INTENT_ACTIONS = ('create', 'read', 'update', 'delete')
+
+@lru_cache(maxsize=4)
+def _configure(api_key: str):
+    """Point the Gemini SDK at api_key (once per key per process)"""
+    genai.configure(api_key=api_key)
+
+@lru_cache(maxsize=8)
+def _render_system_prompt(enable_calendar: bool, today: date) -> str:
+    """Fill date placeholders (memoized - one render per day per variant)"""
+    template = _TEMPLATE_CAL if enable_calendar else _TEMPLATE_NOCAL
+    return template.format_map({
+        'today': today.isoformat(),
+        'tomorrow': (today + timedelta(days=1)).isoformat(),
+        'day_after_tomorrow': (today + timedelta(days=2)).isoformat(),
+    })
+
+@lru_cache(maxsize=4)
+def _render_intent_prompt(today: date) -> str:
+    """Fill the !cal intent prompt's date placeholders (one render per day)"""
+    return _INTENT_TEMPLATE.format_map({
+        'today': today.isoformat(),
+        'tomorrow': (today + timedelta(days=1)).isoformat(),
+        'day_after_tomorrow': (today + timedelta(days=2)).isoformat(),
+    })
+
+def _proto_type(type_str: str):
+    """Convert JSON schema type to protobuf Type"""
+    type_map = {
+        'string': genai.protos.Type.STRING,
+        'integer': genai.protos.Type.INTEGER,
+        'number': genai.protos.Type.NUMBER,
+        'boolean': genai.protos.Type.BOOLEAN,
+        'array': genai.protos.Type.ARRAY,
+        'object': genai.protos.Type.OBJECT
+    }
+    return type_map.get(type_str, genai.protos.Type.STRING)
+
+def _proto_schema(prop: dict):
+    """Convert one JSON schema property (arrays and objects recurse)"""
+    schema = genai.protos.Schema(
+        type=_proto_type(prop.get('type')),
+        description=prop.get('description', '')
+    )
+    if 'items' in prop:
+        schema.items = _proto_schema(prop['items'])
+    if 'properties' in prop:
+        for k, v in prop['properties'].items():
+            schema.properties[k] = _proto_schema(v)
+        schema.required.extend(prop.get('required', ()))
+    return schema
+
+@lru_cache(maxsize=1)
+def _build_calendar_tools_proto() -> list:
+    """Convert CALENDAR_TOOLS to Gemini Tool protos (built once per process)"""
+    tool_declarations = []
+    
+    for tool_dict in calendar_tools.CALENDAR_TOOLS:
+        func_decl = genai.protos.FunctionDeclaration(
+            name=tool_dict['name'],
+            description=tool_dict['description'],
+            parameters=genai.protos.Schema(
+                type=genai.protos.Type.OBJECT,
+                properties={
+                    k: _proto_schema(v)
+                    for k, v in tool_dict['parameters']['properties'].items()
+                },
+                required=tool_dict['parameters'].get('required', [])
+            )
+        )
+        tool_declarations.append(func_decl)
+    
+    logger.info(f"✅ Loaded {len(tool_declarations)} calendar tools")
+    for decl in tool_declarations:
+        logger.info(f"   - {decl.name}")
+    
+    return [genai.protos.Tool(function_declarations=tool_declarations)]
+
+class LLMAgent:
+    """LLM Agent using Google Gemini with Function Calling"""
+    
+    def __init__(self, api_key: str, model_name: str = "gemini-2.0-flash-exp", 
+                 enable_calendar: bool = False,
+                 use_context_cache: bool = False,
+                 enable_speculation: bool = True):
+        """
+        Initialize LLM Agent
+        
+        Args:
+            api_key: Google Gemini API key
+            model_name: Model to use
+            enable_calendar: Enable calendar tools (requires calendar_agent)
+            use_context_cache: Serve system prompt + tools from a Gemini CachedContent
+                (falls back to a plain model if caching is unavailable)
+            enable_speculation: Prefetch predictable read-only tool calls
+        """
+        self.api_key = api_key
+        self.model_name = model_name
+        self.enable_calendar = enable_calendar
+        
+        # Configure Gemini
+        _configure(self.api_key)
+        
+        # System prompt with calendar awareness (re-rendered when the date changes)
+        self._prompt_date = datetime.now().date()
+        self.system_prompt = self._build_system_prompt(self._prompt_date)
+        
+        # Tool name -> implementation
+        self._tool_fns = {
+            'add_calendar_event': calendar_tools.add_calendar_event,
+            'list_calendar_events': calendar_tools.list_calendar_events,
+            'delete_calendar_event': calendar_tools.delete_calendar_event,
+            'update_calendar_event': calendar_tools.update_calendar_event,
+            'update_calendar_events': calendar_tools.update_calendar_events,
+            'delete_calendar_events': calendar_tools.delete_calendar_events,
+        }
+        
+        # Setup tools
+        self.tools = None
+        if self.enable_calendar:
+            self.tools = self._setup_calendar_tools()
+        
+        # Initialize model with tools
+        self.use_context_cache = use_context_cache
+        self._cached_content = None
+        self._cache_refresh_timer = None
+        self._model_lock = threading.Lock()
+        self.model = self._build_model()
+        
+        # Chat history storage (bounded LRU, idle sessions expire)
+        self.chat_sessions = ShardedLRUCache(
+            shards=SESSION_SHARDS, maxsize=MAX_SESSIONS, ttl=SESSION_TTL, sliding=True,
+            on_evict=self._on_session_evicted
+        )
+        
+        # A Gemini ChatSession is not thread-safe - one turn per user at a time
+        self._session_locks = [threading.Lock() for _ in range(SESSION_LOCK_STRIPES)]
+        
+        # Runs independent tool calls of one turn concurrently
+        self._tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="llm-tool")
         
-        # Inject dates
-        today = datetime.now().strftime("%Y-%m-%d")
-        tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-        day_after = (datetime.now() + timedelta(days=2)).strftime("%Y-%m-%d")
+        # Per-prompt tool call history used to predict and prefetch reads
+        self.enable_speculation = enable_speculation
+        self._tool_patterns = LRUCache(maxsize=PATTERN_CACHE_SIZE)
+        self._patterns_lock = threading.Lock()
+        self._mispredicted = LRUCache(maxsize=PATTERN_CACHE_SIZE)
         
-        base_prompt = base_prompt.replace("{today}", today)
-        base_prompt = base_prompt.replace("{tomorrow}", tomorrow)
-        base_prompt = base_prompt.replace("{day_after_tomorrow}", day_after)
+        # Users whose last turn called a tool (their follow-ups keep tools on)
+        self._tool_users = LRUCache(maxsize=MAX_SESSIONS, ttl=SESSION_TTL)
         
-        return base_prompt
+        # Prompt date each chat session was started with
+        self._session_dates = LRUCache(maxsize=MAX_SESSIONS, ttl=SESSION_TTL, sliding=True)
+        
+        # Histories restored by load_sessions(), consumed on each user's next turn
+        self._saved_histories = {}
+        
+        # Bounds concurrent Gemini calls from aprocess()/aprocess_stream()
+        self._request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        # One lock per user, dropped once no turn holds or awaits it
+        self._async_session_locks = weakref.WeakValueDictionary()
+        
+        logger.info(f"✅ LLM Agent initialized (Calendar: {'ON' if enable_calendar else 'OFF'})")
     
-    def _setup_calendar_tools(self) -> list:
-        """Setup calendar tools"""
-        from agent.tools.calendar_tools import CALENDAR_TOOLS
-        
-        # Convert to proper format
-        tool_declarations = []
-        
-        for tool_dict in CALENDAR_TOOLS:
-            func_decl = genai.protos.FunctionDeclaration(
-                name=tool_dict['name'],
-                description=tool_dict['description'],
-                parameters=genai.protos.Schema(
-                    type=genai.protos.Type.OBJECT,
-                    properties={
-                        k: genai.protos.Schema(
-                            type=self._get_proto_type(v.get('type')),
-                            description=v.get('description', '')
-                        )
-                        for k, v in tool_dict['parameters']['properties'].items()
-                    },
-                    required=tool_dict['parameters'].get('required', [])
-                )
+    def _build_model(self):
+        """Create the model for the current system prompt (context-cached if enabled)"""
+        model = self._create_cached_model() if self.use_context_cache else None
+        if model is None:
+            model = genai.GenerativeModel(
+                model_name=self.model_name,
+                tools=self.tools,
+                system_instruction=self.system_prompt
             )
-            tool_declarations.append(func_decl)
-        
-        logger.info(f"✅ Loaded {len(tool_declarations)} calendar tools")
-        for decl in tool_declarations:
-            logger.info(f"   - {decl.name}")
-        
-        return [genai.protos.Tool(function_declarations=tool_declarations)]
-    
-    def _get_proto_type(self, type_str: str):
-        """Convert JSON schema type to protobuf Type"""
-        type_map = {
-            'string': genai.protos.Type.STRING,
-            'integer': genai.protos.Type.INTEGER,
-            'number': genai.protos.Type.NUMBER,
-            'boolean': genai.protos.Type.BOOLEAN,
-            'array': genai.protos.Type.ARRAY,
-            'object': genai.protos.Type.OBJECT
-        }
-        return type_map.get(type_str, genai.protos.Type.STRING)
+        return model
     
-    def _extract_function_calls(self, response):
+    def _current_model(self):
+        """
+        Model whose system prompt carries today's date
+        
+        On the first turn after midnight the prompt is re-rendered and the
+        model recreated, so "hari ini"/"besok" resolve to the right day. A
+        replaced context cache is no longer refreshed and simply expires.
         """
-        Extract function calls from response - FIXED VERSION
-        Handles both standard parts and raw response extraction
+        today = datetime.now().date()
+        if today == self._prompt_date:
+            return self.model
+        
+        with self._model_lock:
+            if today != self._prompt_date:
+                if self._cache_refresh_timer is not None:
+                    self._cache_refresh_timer.cancel()
+                    self._cache_refresh_timer = None
+                self.system_prompt = self._build_system_prompt(today)
+                self.model = self._build_model()
+                self._prompt_date = today
+                logger.info("📅 System prompt refreshed for %s", today)
+            return self.model
+    
+    def _create_cached_model(self):
         """
-        function_calls = []
+        Register system prompt + tools as a Gemini CachedContent
         
+        Returns a model bound to the cache, or None if caching is unavailable
+        (unsupported model, prompt below the minimum cache size, etc.)
+        """
         try:
-            # Method 1: Try standard part.function_call access
-            if hasattr(response, 'parts'):
-                for part in response.parts:
-                    # Check if part has function_call and it's not empty
-                    if hasattr(part, 'function_call'):
-                        fc = part.function_call
-                        # Check if function_call has name and it's not empty
-                        if hasattr(fc, 'name') and fc.name:
-                            function_calls.append({
-                                'name': fc.name,
-                                'args': dict(fc.args) if hasattr(fc, 'args') else {}
-                            })
-                            logger.info(f"✅ Extracted via parts: {fc.name}")
-            
-            # Method 2: If no function calls found, try raw extraction
-            if not function_calls:
-                logger.info("🔍 No function calls in parts, trying raw extraction...")
-                function_calls = self._extract_function_calls_from_raw(response)
-            
+            self._cached_content = genai.caching.CachedContent.create(
+                model=self.model_name,
+                system_instruction=self.system_prompt,
+                tools=self.tools,
+                ttl=CONTEXT_CACHE_TTL
+            )
+            model = genai.GenerativeModel.from_cached_content(self._cached_content)
+            self._schedule_cache_refresh()
+            logger.info(f"✅ Context cache created: {self._cached_content.name}")
+            return model
         except Exception as e:
-            logger.error(f"❌ Error extracting function calls: {e}", exc_info=True)
-        
-        return function_calls
+            logger.warning(f"⚠️ Context cache unavailable, using plain model: {e}")
+            self._cached_content = None
+            return None
+    
+    def _schedule_cache_refresh(self):
+        """Extend the context cache TTL shortly before it expires"""
+        timer = threading.Timer(CONTEXT_CACHE_REFRESH.total_seconds(), self._refresh_context_cache)
+        timer.daemon = True
+        timer.start()
+        self._cache_refresh_timer = timer
+    
+    def _refresh_context_cache(self):
+        """Background job: push the context cache expiry forward"""
+        try:
+            self._cached_content.update(ttl=CONTEXT_CACHE_TTL)
+            logger.info("🔄 Context cache TTL extended")
+        except Exception as e:
+            logger.warning(f"⚠️ Context cache refresh failed: {e}")
+        self._schedule_cache_refresh()
+    
+    def close(self):
+        """Stop background context cache refresh and tool workers"""
+        if self._cache_refresh_timer is not None:
+            self._cache_refresh_timer.cancel()
+            self._cache_refresh_timer = None
+        self._tool_executor.shutdown(wait=False)
     
-    def _extract_function_calls_from_raw(self, response):
+    def _build_system_prompt(self, today: date) -> str:
+        """Build system prompt based on capabilities"""
+        return _render_system_prompt(self.enable_calendar, today)
+    
+    def _setup_calendar_tools(self) -> list:
+        """Setup calendar tools (built once, shared by all agents)"""
+        return _build_calendar_tools_proto()
+    
+    def _extract_function_calls(self, response):
         """
-        Extract function calls from raw response
-        This is a workaround for empty name bug
+        Extract function calls from response
+        Walks the response parts once; parts without a function name are skipped
         """
         function_calls = []
         
         try:
-            # Try to get raw proto message
-            if hasattr(response, '_result'):
-                raw = response._result
-                logger.info(f"🔍 Raw result type: {type(raw)}")
+            for part in getattr(response, 'parts', ()):
+                fc = getattr(part, 'function_call', None)
+                name = getattr(fc, 'name', None)
+                if not name:
+                    continue
                 
-                # Try to serialize to dict
-                try:
-                    if hasattr(raw, 'to_dict'):
-                        raw_dict = raw.to_dict()
-                        logger.info(f"🔍 Raw dict keys: {raw_dict.keys()}")
-                        
-                        # Navigate to function calls
-                        if 'candidates' in raw_dict:
-                            for candidate in raw_dict['candidates']:
-                                if 'content' in candidate and 'parts' in candidate['content']:
-                                    for part in candidate['content']['parts']:
-                                        if 'function_call' in part:
-                                            fc_dict = part['function_call']
-                                            logger.info(f"🔍 Found function_call dict: {fc_dict}")
-                                            
-                                            if 'name' in fc_dict and fc_dict['name']:
-                                                function_calls.append(fc_dict)
-                                                logger.info(f"✅ Extracted: {fc_dict['name']}")
-                except Exception as e:
-                    logger.error(f"❌ Error serializing raw: {e}")
+                function_calls.append({
+                    'name': name,
+                    'args': dict(fc.args) if getattr(fc, 'args', None) else {}
+                })
+                logger.info("✅ Extracted: %s", name)
             
-            # Alternative: Try to serialize response candidates directly
-            if not function_calls and hasattr(response, 'candidates') and response.candidates:
-                candidate = response.candidates[0]
-                
-                # Try to_dict on candidate
-                try:
-                    if hasattr(candidate, 'to_dict'):
-                        cand_dict = candidate.to_dict()
-                        logger.info(f"🔍 Candidate dict: {json.dumps(cand_dict, indent=2)[:500]}")
-                        
-                        if 'content' in cand_dict and 'parts' in cand_dict['content']:
-                            for part in cand_dict['content']['parts']:
-                                if 'function_call' in part:
-                                    fc_dict = part['function_call']
-                                    if 'name' in fc_dict and fc_dict['name']:
-                                        function_calls.append(fc_dict)
-                                        logger.info(f"✅ Extracted from candidate: {fc_dict['name']}")
-                except Exception as e:
-                    logger.error(f"❌ Error with candidate to_dict: {e}")
-        
         except Exception as e:
-            logger.error(f"❌ Raw extraction error: {e}", exc_info=True)
+            logger.error(f"❌ Error extracting function calls: {e}", exc_info=True)
         
         return function_calls
     
@@ -255,27 +479,21 @@ RESPONSE STYLE:
         function_name = function_call_dict.get('name')
         function_args = function_call_dict.get('args', {})
         
-        logger.info(f"🔧 Executing: {function_name}")
-        logger.info(f"   Args: {json.dumps(function_args, indent=2)}")
+        logger.info("🔧 Executing: %s", function_name)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("   Args: %s", json.dumps(function_args, default=str))
         
         try:
-            from agent.tools import calendar_tools
-            
-            if function_name == "add_calendar_event":
-                result = calendar_tools.add_calendar_event(**function_args)
-            elif function_name == "list_calendar_events":
-                result = calendar_tools.list_calendar_events(**function_args)
-            elif function_name == "delete_calendar_event":
-                result = calendar_tools.delete_calendar_event(**function_args)
-            elif function_name == "update_calendar_event":
-                result = calendar_tools.update_calendar_event(**function_args)
+            fn = self._tool_fns.get(function_name)
+            if fn is not None:
+                result = fn(**function_args)
             else:
                 result = {
                     'success': False,
                     'error': f"Unknown function: {function_name}"
                 }
             
-            logger.info(f"✅ Executed successfully")
+            logger.info("✅ Executed successfully")
             return result
             
         except Exception as e:
@@ -314,85 +532,533 @@ RESPONSE STYLE:
             logger.error(f"❌ Error getting text response: {e}")
             return ""
     
+    def _on_session_evicted(self, user_id, chat):
+        """Called when an idle or least recently used session is dropped"""
+        logger.info("🧹 Chat session evicted: %s", user_id)
+    
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        """Lock serializing turns of one user's chat session"""
+        return self._session_locks[hash(user_id) % len(self._session_locks)]
+    
+    def _async_user_lock(self, user_id: str) -> asyncio.Lock:
+        """
+        asyncio counterpart of _user_lock for aprocess()/aprocess_stream()
+        
+        Not striped: a stream holds its user's lock until the consumer is
+        done, which must not stall other users that happen to share a stripe.
+        """
+        lock = self._async_session_locks.get(user_id)
+        if lock is None:
+            lock = self._async_session_locks[user_id] = asyncio.Lock()
+        return lock
+    
+    def _trim_history(self, chat):
+        """
+        Keep only the most recent MAX_HISTORY_MESSAGES messages of a chat
+        
+        The cut always lands on a user text message, so a function_call is
+        never separated from its function_response.
+        """
+        history = chat.history
+        if len(history) <= MAX_HISTORY_MESSAGES:
+            return
+        
+        start = len(history) - MAX_HISTORY_MESSAGES
+        while start < len(history) and not (
+            history[start].role == 'user' and any(part.text for part in history[start].parts)
+        ):
+            start += 1
+        
+        chat.history = history[start:]
+        logger.info("✂️ Trimmed chat history to %d messages", len(history) - start)
+    
+    def _send_kwargs(self, user_id: str, message: str) -> dict:
+        """
+        Extra send_message arguments for this turn
+        
+        Pure greetings / thanks ("halo", "makasih ya!") are sent with function
+        calling disabled, unless the user's previous turn used a tool (a bare
+        "oke" may be confirming a calendar action). Anything else keeps tools
+        on - short requests like "delete it" or "jam 3 pagi" still need them.
+        """
+        if not self.enable_calendar or user_id in self._tool_users:
+            return {}
+        
+        words = _WORD_RE.findall(message.lower())
+        if not words or not _SMALL_TALK_WORDS.issuperset(words):
+            return {}
+        
+        logger.info("💬 Small talk, tools disabled for this turn")
+        return {'tool_config': NO_TOOLS_CONFIG}
+    
+    def _note_tool_use(self, user_id: str, function_calls):
+        """Remember whether this user's latest turn called a tool"""
+        if function_calls:
+            self._tool_users[user_id] = True
+        else:
+            self._tool_users.pop(user_id)
+    
+    def _start_chat(self, model, user_id: str, history):
+        """Start a chat session on model and remember its prompt date"""
+        self._session_dates[user_id] = self._prompt_date
+        return model.start_chat(history=history)
+    
+    def _get_chat(self, user_id: str):
+        """Get or create the user's chat session (moved to today's model after midnight)"""
+        model = self._current_model()
+        chat = self.chat_sessions.get_or_set(
+            user_id,
+            lambda: self._start_chat(model, user_id, self._saved_histories.pop(user_id, None) or [])
+        )
+        
+        if self._session_dates.get(user_id, self._prompt_date) != self._prompt_date:
+            chat = self._start_chat(model, user_id, chat.history)
+            self.chat_sessions[user_id] = chat
+        return chat
+    
+    def _function_response_parts(self, function_calls, results) -> list:
+        """Build function response parts to send back to Gemini"""
+        return [
+            genai.protos.Part(
+                function_response=genai.protos.FunctionResponse(
+                    name=fc_dict['name'],
+                    response={'result': result}
+                )
+            )
+            for fc_dict, result in zip(function_calls, results)
+        ]
+    
+    def _tool_result_message(self, results) -> str:
+        """
+        Reply to use when the model says nothing after a tool call
+        
+        Reads the raw tool results - the copies inside the response parts are
+        proto map wrappers, not dicts.
+        """
+        if results:
+            result_data = results[0]
+            if isinstance(result_data, dict) and 'message' in result_data:
+                return result_data['message']
+        return "✅ Operasi berhasil dilakukan!"
+    
+    def _final_reply(self, final_response, results) -> str:
+        """Extract text from the post-tool response, falling back to the tool result"""
+        final_text = self._get_text_response(final_response)
+        
+        if not final_text:
+            # If no text response after function call, return the function result message
+            return self._tool_result_message(results)
+        
+        logger.info("✅ Process completed")
+        return final_text
+    
+    def _run_function_calls(self, function_calls) -> list:
+        """Execute function calls, in parallel when independent (results keep call order)"""
+        if len(function_calls) > 1 and _can_run_parallel(function_calls):
+            return list(self._tool_executor.map(self._execute_function, function_calls))
+        return [self._execute_function(fc_dict) for fc_dict in function_calls]
+    
+    def _record_tool_pattern(self, pattern_key, function_calls):
+        """
+        Remember which single tool call (if any) this prompt led to
+        
+        Dates are stored relative to the prompt date, so "apa jadwalku hari ini"
+        keeps predicting today's list instead of the day it was first seen.
+        """
+        if not self.enable_speculation:
+            return
+        observed = None
+        if len(function_calls) == 1:
+            fc = function_calls[0]
+            observed = _call_key({
+                'name': fc.get('name'),
+                'args': _relative_args(fc.get('args', {}), self._prompt_date)
+            })
+        with self._patterns_lock:
+            counts = self._tool_patterns.get_or_set(pattern_key, Counter)
+            counts[observed] += 1
+    
+    def _speculate(self, pattern_key):
+        """
+        Start the predicted read-only tool call for this prompt, if confident
+        
+        Returns (pattern_key, call_key, future) or None
+        """
+        if not self.enable_speculation or pattern_key in self._mispredicted:
+            return None
+        
+        with self._patterns_lock:
+            counts = self._tool_patterns.get(pattern_key)
+            if not counts:
+                return None
+            total = sum(counts.values())
+            predicted, hits = counts.most_common(1)[0]
+        
+        if (predicted is None or predicted[0] not in READ_ONLY_FUNCTIONS
+                or total < SPECULATION_MIN_SAMPLES
+                or hits / total < SPECULATION_MIN_CONFIDENCE):
+            return None
+        
+        name, args_json = predicted
+        call = {'name': name, 'args': _absolute_args(json.loads(args_json), self._prompt_date)}
+        logger.info("🔮 Prefetching %s", name)
+        future = self._tool_executor.submit(self._execute_function, call)
+        return pattern_key, _call_key(call), future
+    
+    def _discard_prefetch(self, prefetched):
+        """Cancel an unused prefetch and stop speculating on its prompt"""
+        pattern_key, _, future = prefetched
+        future.cancel()
+        self._mispredicted[pattern_key] = True
+        logger.info("🔮 Prefetch missed, speculation off for this prompt")
+    
+    def _resolve_function_calls(self, function_calls, prefetched=None) -> list:
+        """Run function calls, reusing a prefetched result if the model asked for exactly that call"""
+        if prefetched is not None:
+            _, predicted, future = prefetched
+            if len(function_calls) == 1 and _call_key(function_calls[0]) == predicted:
+                logger.info("⚡ Using prefetched tool result")
+                return [future.result()]
+            self._discard_prefetch(prefetched)
+        return self._run_function_calls(function_calls)
+    
+    def _handle_function_calls(self, chat, function_calls, prefetched=None) -> str:
+        """Execute function calls, send results back and return final text"""
+        logger.info("🔧 Executing %d function(s)...", len(function_calls))
+        
+        results = self._resolve_function_calls(function_calls, prefetched)
+        response_parts = self._function_response_parts(function_calls, results)
+        
+        # Get final response
+        logger.info("🤖 Getting final response...")
+        final_response = chat.send_message(response_parts)
+        
+        return self._final_reply(final_response, results)
+    
+    def _text_reply(self, response) -> str:
+        """Text of a reply without function calls"""
+        logger.info("💬 No function calls, returning text")
+        text_response = self._get_text_response(response)
+        
+        # If still no text, return default message
+        if not text_response:
+            return NO_RESPONSE_MESSAGE
+        
+        return text_response
+    
     def process(self, user_id: str, message: str) -> str:
         """Main processing with function calling - FIXED VERSION"""
         try:
-            # Get or create chat session
-            if user_id not in self.chat_sessions:
-                self.chat_sessions[user_id] = self.model.start_chat(history=[])
-            
-            chat = self.chat_sessions[user_id]
-            
-            # Send message
-            logger.info(f"📨 User: {message[:100]}...")
-            response = chat.send_message(message)
-            
-            # Extract function calls using the fixed method
-            function_calls = self._extract_function_calls(response)
-            
-            logger.info(f"🔍 Extracted {len(function_calls)} function call(s)")
-            
-            # If no function calls, return text safely
-            if not function_calls:
-                logger.info("💬 No function calls, returning text")
-                text_response = self._get_text_response(response)
+            with self._user_lock(user_id):
+                chat = self._get_chat(user_id)
                 
-                # If still no text, return default message
-                if not text_response:
-                    return "Maaf, saya tidak bisa memproses permintaan ini. Bisa ulangi dengan cara lain?"
+                # Predicted read runs while Gemini is thinking
+                pattern_key = (user_id, _normalize_message(message))
+                prefetched = self._speculate(pattern_key)
                 
-                return text_response
-            
-            # Execute function calls
-            logger.info(f"🔧 Executing {len(function_calls)} function(s)...")
-            
-            response_parts = []
-            for fc_dict in function_calls:
-                result = self._execute_function(fc_dict)
+                # Send message
+                logger.info("📨 User: %.100s...", message)
+                response = chat.send_message(message, **self._send_kwargs(user_id, message))
                 
-                # Build function response part
-                response_parts.append(
-                    genai.protos.Part(
-                        function_response=genai.protos.FunctionResponse(
-                            name=fc_dict['name'],
-                            response={'result': result}
-                        )
-                    )
-                )
-            
-            # Get final response
-            logger.info("🤖 Getting final response...")
-            final_response = chat.send_message(response_parts)
-            
-            # Safely extract final text
-            final_text = self._get_text_response(final_response)
-            
-            if not final_text:
-                # If no text response after function call, return the function result message
-                if response_parts and 'result' in response_parts[0].function_response.response:
-                    result_data = response_parts[0].function_response.response['result']
-                    if isinstance(result_data, dict) and 'message' in result_data:
-                        return result_data['message']
-                return "✅ Operasi berhasil dilakukan!"
-            
-            logger.info("✅ Process completed")
-            return final_text
+                # Extract function calls using the fixed method
+                function_calls = self._extract_function_calls(response)
+                
+                logger.info("🔍 Extracted %d function call(s)", len(function_calls))
+                self._record_tool_pattern(pattern_key, function_calls)
+                self._note_tool_use(user_id, function_calls)
+                
+                # If no function calls, return text safely
+                if not function_calls:
+                    if prefetched is not None:
+                        self._discard_prefetch(prefetched)
+                    reply = self._text_reply(response)
+                else:
+                    reply = self._handle_function_calls(chat, function_calls, prefetched)
+                
+                self._trim_history(chat)
+                return reply
             
         except Exception as e:
             logger.error(f"❌ Process error: {e}", exc_info=True)
             return f"❌ Error: {str(e)}"
     
+    async def aprocess(self, user_id: str, message: str) -> str:
+        """
+        Async process - awaits Gemini instead of blocking the event loop
+        
+        Tool calls run off the event loop (in parallel when independent).
+        Turns of one user run in order; at most MAX_CONCURRENT_REQUESTS turns
+        are in flight at once.
+        """
+        async with self._async_user_lock(user_id), self._request_semaphore:
+            try:
+                chat = self._get_chat(user_id)
+                pattern_key = (user_id, _normalize_message(message))
+                prefetched = self._speculate(pattern_key)
+                
+                logger.info("📨 User (async): %.100s...", message)
+                response = await chat.send_message_async(message, **self._send_kwargs(user_id, message))
+                
+                function_calls = self._extract_function_calls(response)
+                
+                logger.info("🔍 Extracted %d function call(s)", len(function_calls))
+                self._record_tool_pattern(pattern_key, function_calls)
+                self._note_tool_use(user_id, function_calls)
+                
+                if not function_calls:
+                    if prefetched is not None:
+                        self._discard_prefetch(prefetched)
+                    reply = self._text_reply(response)
+                    self._trim_history(chat)
+                    return reply
+                
+                logger.info("🔧 Executing %d function(s)...", len(function_calls))
+                results = await asyncio.to_thread(
+                    self._resolve_function_calls, function_calls, prefetched
+                )
+                response_parts = self._function_response_parts(function_calls, results)
+                
+                logger.info("🤖 Getting final response...")
+                final_response = await chat.send_message_async(response_parts)
+                
+                self._trim_history(chat)
+                return self._final_reply(final_response, results)
+                
+            except Exception as e:
+                logger.error(f"❌ Async process error: {e}", exc_info=True)
+                return f"❌ Error: {str(e)}"
+    
+    def _stream_text(self, response) -> Iterator[str]:
+        """Yield non-empty text of each streamed chunk"""
+        for chunk in response:
+            text = self._get_text_response(chunk)
+            if text:
+                yield text
+    
+    def process_stream(self, user_id: str, message: str) -> Iterator[str]:
+        """
+        Streaming process - yields text as Gemini generates it
+        
+        Function calls arrive whole at the end of the first stream; they are
+        executed and the model's follow-up reply is streamed as well.
+        """
+        try:
+            with self._user_lock(user_id):
+                chat = self._get_chat(user_id)
+                
+                logger.info("📨 User (stream): %.100s...", message)
+                response = chat.send_message(message, stream=True, **self._send_kwargs(user_id, message))
+                
+                streamed = False
+                for text in self._stream_text(response):
+                    streamed = True
+                    yield text
+                
+                # Function calls are only complete once the stream is consumed
+                function_calls = self._extract_function_calls(response)
+                self._note_tool_use(user_id, function_calls)
+                if function_calls:
+                    logger.info("🔧 Executing %d function(s)...", len(function_calls))
+                    results = self._run_function_calls(function_calls)
+                    response_parts = self._function_response_parts(function_calls, results)
+                    
+                    logger.info("🤖 Streaming final response...")
+                    final_response = chat.send_message(response_parts, stream=True)
+                    
+                    final_streamed = False
+                    for text in self._stream_text(final_response):
+                        final_streamed = True
+                        yield text
+                    
+                    if not final_streamed:
+                        yield self._tool_result_message(results)
+                elif not streamed:
+                    yield NO_RESPONSE_MESSAGE
+                
+                self._trim_history(chat)
+            
+        except Exception as e:
+            logger.error(f"❌ Stream error: {e}", exc_info=True)
+            yield f"❌ Error: {str(e)}"
+    
+    async def _astream_text(self, response) -> AsyncIterator[str]:
+        """Yield non-empty text of each chunk of an async stream"""
+        async for chunk in response:
+            text = self._get_text_response(chunk)
+            if text:
+                yield text
+    
+    async def aprocess_stream(self, user_id: str, message: str) -> AsyncIterator[str]:
+        """
+        Async streaming process - yields text without blocking the event loop
+        
+        Same flow as process_stream; tool calls run off the event loop and the
+        follow-up reply is streamed too. The request semaphore is only held
+        while a Gemini call is sent or tools run, never across a yield.
+        
+        The user's lock is held until the stream ends, so a consumer that stops
+        early must aclose() the generator (e.g. via contextlib.aclosing) or
+        that user's next turn waits until it is garbage collected.
+        """
+        async with self._async_user_lock(user_id):
+            try:
+                chat = self._get_chat(user_id)
+                
+                logger.info("📨 User (async stream): %.100s...", message)
+                async with self._request_semaphore:
+                    response = await chat.send_message_async(
+                        message, stream=True, **self._send_kwargs(user_id, message)
+                    )
+                
+                streamed = False
+                async for text in self._astream_text(response):
+                    streamed = True
+                    yield text
+                
+                # Function calls are only complete once the stream is consumed
+                function_calls = self._extract_function_calls(response)
+                self._note_tool_use(user_id, function_calls)
+                if function_calls:
+                    logger.info("🔧 Executing %d function(s)...", len(function_calls))
+                    async with self._request_semaphore:
+                        results = await asyncio.to_thread(self._run_function_calls, function_calls)
+                        response_parts = self._function_response_parts(function_calls, results)
+                        
+                        logger.info("🤖 Streaming final response...")
+                        final_response = await chat.send_message_async(response_parts, stream=True)
+                    
+                    final_streamed = False
+                    async for text in self._astream_text(final_response):
+                        final_streamed = True
+                        yield text
+                    
+                    if not final_streamed:
+                        yield self._tool_result_message(results)
+                elif not streamed:
+                    yield NO_RESPONSE_MESSAGE
+                
+                self._trim_history(chat)
+                
+            except Exception as e:
+                logger.error(f"❌ Async stream error: {e}", exc_info=True)
+                yield f"❌ Error: {str(e)}"
+    
+    def chat_stream(self, user_id: str, message: str) -> Iterator[str]:
+        """Chat with streamed output (delegates to process_stream)"""
+        return self.process_stream(user_id, message)
+    
+    def chat_stream_async(self, user_id: str, message: str) -> AsyncIterator[str]:
+        """Async chat with streamed output (delegates to aprocess_stream)"""
+        return self.aprocess_stream(user_id, message)
+    
     def chat(self, user_id: str, message: str) -> str:
         """Simple chat (delegates to process)"""
         return self.process(user_id, message)
     
+    async def chat_async(self, user_id: str, message: str) -> str:
+        """Async chat for event-loop callers (delegates to aprocess)"""
+        return await self.aprocess(user_id, message)
+    
     def clear_history(self, user_id: str) -> str:
         """Clear chat history"""
+        restored = self._saved_histories.pop(user_id, None)
         if user_id in self.chat_sessions:
             del self.chat_sessions[user_id]
             return "✅ Chat history cleared!"
+        if restored is not None:
+            return "✅ Chat history cleared!"
         return "ℹ️ No chat history to clear."
     
+    def save_sessions(self, path: str) -> int:
+        """
+        Write every live chat history to a JSON file (e.g. on shutdown)
+        
+        Args:
+            path: File to write
+        
+        Returns:
+            int: Number of sessions saved
+        """
+        sessions = {}
+        for user_id in list(self.chat_sessions):
+            chat = self.chat_sessions.get(user_id)
+            if chat is not None and chat.history:
+                sessions[user_id] = [type(content).to_dict(content) for content in chat.history]
+        
+        # Histories not picked up since the last load are still worth keeping
+        for user_id, history in list(self._saved_histories.items()):
+            sessions.setdefault(user_id, history)
+        
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'saved_at': time.time(), 'sessions': sessions}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        
+        logger.info("💾 Saved %d chat session(s) to %s", len(sessions), path)
+        return len(sessions)
+    
+    def load_sessions(self, path: str) -> int:
+        """
+        Restore chat histories written by save_sessions()
+        
+        Sessions are rebuilt lazily on each user's next message. A file older
+        than SESSION_TTL is ignored, as those sessions would have expired.
+        
+        Args:
+            path: File to read
+        
+        Returns:
+            int: Number of sessions restored
+        """
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Could not load chat sessions: {e}")
+            return 0
+        
+        if time.time() - data.get('saved_at', 0) > SESSION_TTL:
+            logger.info("ℹ️ Saved chat sessions are stale, starting fresh")
+            return 0
+        
+        sessions = data.get('sessions', {})
+        self._saved_histories.update(sessions)
+        logger.info("📂 Restored %d chat session(s) from %s", len(sessions), path)
+        return len(sessions)
+    
+    def parse_calendar_intent(self, command: str) -> dict | None:
+        """
+        Parse a !cal command into an intent dict
+        
+        A single stateless call - no chat history and no tools - answered
+        as JSON. Blocking; the bot runs it via asyncio.to_thread.
+        
+        Args:
+            command: Calendar command in natural language
+        
+        Returns:
+            Dict with 'action' (one of INTENT_ACTIONS) and its fields,
+            or None if the command could not be parsed
+        """
+        model = genai.GenerativeModel(
+            model_name=self.model_name,
+            system_instruction=_render_intent_prompt(datetime.now().date()),
+            generation_config={'response_mime_type': 'application/json'}
+        )
+        try:
+            response = model.generate_content(command)
+            intent = json.loads(self._get_text_response(response))
+        except Exception as e:
+            logger.error("❌ Intent parsing failed: %s", e)
+            return None
+        
+        if not isinstance(intent, dict) or intent.get('action') not in INTENT_ACTIONS:
+            logger.info("ℹ️ No calendar intent in: %s", command[:50])
+            return None
+        return intent
+    
     def get_help(self) -> str:
         """Get help message"""
         base_help = """
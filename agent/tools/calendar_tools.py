@@ -1,40 +1,60 @@
 """
 Calendar Tools - Connected to Google Calendar via CalendarAgent
 """
+import json
 import logging
+import os
+import threading
 from datetime import datetime, timedelta
+from types import MappingProxyType
 
 logger = logging.getLogger(__name__)
 
-# Global CalendarAgent instance
+# Global CalendarAgent instance and the (credentials_path, token_path) it was built with
 _calendar_agent = None
+_calendar_agent_paths = None
+_calendar_agent_lock = threading.Lock()
 
 def init_calendar_agent(credentials_path='credentials/credentials.json', 
                        token_path='credentials/token.json'):
     """
     Initialize CalendarAgent (call this once at startup)
+    
+    Repeat calls return the existing agent without re-running OAuth; paths
+    that differ from the ones it was built with are ignored (with a warning).
     """
-    global _calendar_agent
+    global _calendar_agent, _calendar_agent_paths
     
-    if _calendar_agent is None:
-        from agent.calendar_agent import CalendarAgent
-        _calendar_agent = CalendarAgent(
-            credentials_path=credentials_path,
-            token_path=token_path,
-            timezone='Asia/Jakarta'
-        )
-        logger.info("✅ CalendarAgent initialized in calendar_tools")
+    paths = (credentials_path, token_path)
+    
+    # Racing first calls must not run the OAuth flow twice
+    with _calendar_agent_lock:
+        if _calendar_agent is None:
+            from agent.calendar_agent import CalendarAgent
+            _calendar_agent = CalendarAgent(
+                credentials_path=credentials_path,
+                token_path=token_path,
+                timezone='Asia/Jakarta'
+            )
+            _calendar_agent_paths = paths
+            logger.info("✅ CalendarAgent initialized in calendar_tools")
+        elif paths != _calendar_agent_paths:
+            logger.warning(
+                "⚠️ CalendarAgent already initialized with %s / %s; ignoring %s / %s",
+                *(_calendar_agent_paths or (None, None)), *paths
+            )
+        else:
+            logger.info("♻️ Reusing existing CalendarAgent (%s / %s)", *paths)
     
     return _calendar_agent
 
 def get_calendar_agent():
-    """Get or initialize CalendarAgent"""
-    global _calendar_agent
+    """Get or initialize CalendarAgent (lock-free once initialized)"""
+    agent = _calendar_agent
+    if agent is not None:
+        return agent
     
-    if _calendar_agent is None:
-        init_calendar_agent()
-    
-    return _calendar_agent
+    return init_calendar_agent()
 
 # ====================
 # TOOL FUNCTIONS
@@ -56,7 +76,7 @@ def add_calendar_event(title: str, date: str, time: str,
         dict: Result with success status and message
     """
     try:
-        logger.info(f"📝 Creating event: {title} on {date} at {time}")
+        logger.info("📝 Creating event: %s on %s at %s", title, date, time)
         
         agent = get_calendar_agent()
         result = agent.create_event(
@@ -67,11 +87,11 @@ def add_calendar_event(title: str, date: str, time: str,
             description=description
         )
         
-        logger.info(f"✅ Event created: {result.get('event_id')}")
+        logger.info("✅ Event created: %s", result.get('event_id'))
         return result
         
     except Exception as e:
-        logger.error(f"❌ Error creating event: {e}", exc_info=True)
+        logger.error("❌ Error creating event: %s", e, exc_info=True)
         return {
             'success': False,
             'message': f"❌ Error: {str(e)}"
@@ -92,16 +112,16 @@ def list_calendar_events(date: str = None, days: int = 7):
         dict: Result with events list and message
     """
     try:
-        logger.info(f"📅 Listing events: date={date}, days={days}")
+        logger.info("📅 Listing events: date=%s, days=%s", date, days)
         
         agent = get_calendar_agent()
         result = agent.read_events(date=date, days=days)
         
-        logger.info(f"✅ Found {len(result.get('events', []))} events")
+        logger.info("✅ Found %d events", len(result.get('events', [])))
         return result
         
     except Exception as e:
-        logger.error(f"❌ Error listing events: {e}", exc_info=True)
+        logger.error("❌ Error listing events: %s", e, exc_info=True)
         return {
             'success': False,
             'message': f"❌ Error: {str(e)}"
@@ -125,29 +145,26 @@ def update_calendar_event(event_id: str, title: str = None,
         dict: Result with success status and message
     """
     try:
-        logger.info(f"✏️ Updating event: {event_id}")
+        logger.info("✏️ Updating event: %s", event_id)
         
-        # Build kwargs for update
-        update_kwargs = {}
-        if title is not None:
-            update_kwargs['title'] = title
-        if date is not None:
-            update_kwargs['date'] = date
-        if time is not None:
-            update_kwargs['time'] = time
-        if duration is not None:
-            update_kwargs['duration'] = duration
-        if description is not None:
-            update_kwargs['description'] = description
+        # Build kwargs for update - only fields that were given
+        candidate = {
+            'title': title,
+            'date': date,
+            'time': time,
+            'duration': duration,
+            'description': description
+        }
+        update_kwargs = {k: v for k, v in candidate.items() if v is not None}
         
         agent = get_calendar_agent()
         result = agent.update_event(event_id=event_id, **update_kwargs)
         
-        logger.info(f"✅ Event updated")
+        logger.info("✅ Event updated")
         return result
         
     except Exception as e:
-        logger.error(f"❌ Error updating event: {e}", exc_info=True)
+        logger.error("❌ Error updating event: %s", e, exc_info=True)
         return {
             'success': False,
             'message': f"❌ Error: {str(e)}"
@@ -164,16 +181,75 @@ def delete_calendar_event(event_id: str):
         dict: Result with success status and message
     """
     try:
-        logger.info(f"🗑️ Deleting event: {event_id}")
+        logger.info("🗑️ Deleting event: %s", event_id)
         
         agent = get_calendar_agent()
         result = agent.delete_event(event_id=event_id)
         
-        logger.info(f"✅ Event deleted")
+        logger.info("✅ Event deleted")
+        return result
+        
+    except Exception as e:
+        logger.error("❌ Error deleting event: %s", e, exc_info=True)
+        return {
+            'success': False,
+            'message': f"❌ Error: {str(e)}"
+        }
+
+def update_calendar_events(updates: list):
+    """
+    Update several events in Google Calendar (batched HTTP calls)
+    
+    Args:
+        updates: List of dicts with 'event_id' plus fields to update
+                 (title, date, time, duration, description)
+    
+    Returns:
+        dict: Result with updated/failed event IDs and message
+    """
+    try:
+        logger.info("✏️ Updating %d events", len(updates))
+        
+        # Only fields that were given
+        update_list = [
+            {k: v for k, v in dict(update).items() if v is not None}
+            for update in updates
+        ]
+        
+        agent = get_calendar_agent()
+        result = agent.update_events(update_list)
+        
+        logger.info("✅ Updated %d events", len(result.get('updated', [])))
+        return result
+        
+    except Exception as e:
+        logger.error("❌ Error updating events: %s", e, exc_info=True)
+        return {
+            'success': False,
+            'message': f"❌ Error: {str(e)}"
+        }
+
+def delete_calendar_events(event_ids: list):
+    """
+    Delete several events from Google Calendar (batched HTTP calls)
+    
+    Args:
+        event_ids: List of event IDs to delete
+    
+    Returns:
+        dict: Result with deleted/failed event IDs and message
+    """
+    try:
+        logger.info("🗑️ Deleting %d events", len(event_ids))
+        
+        agent = get_calendar_agent()
+        result = agent.delete_events(list(event_ids))
+        
+        logger.info("✅ Deleted %d events", len(result.get('deleted', [])))
         return result
         
     except Exception as e:
-        logger.error(f"❌ Error deleting event: {e}", exc_info=True)
+        logger.error("❌ Error deleting events: %s", e, exc_info=True)
         return {
             'success': False,
             'message': f"❌ Error: {str(e)}"
@@ -183,101 +259,15 @@ def delete_calendar_event(event_id: str):
 # TOOL DECLARATIONS for Gemini
 # ====================
 
-CALENDAR_TOOLS = [
-    {
-        'name': 'add_calendar_event',
-        'description': 'Add a new event to Google Calendar. Use this when user wants to create/add/schedule an event.',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'title': {
-                    'type': 'string',
-                    'description': 'Event title/summary'
-                },
-                'date': {
-                    'type': 'string',
-                    'description': 'Event date in YYYY-MM-DD format (e.g. "2024-12-25")'
-                },
-                'time': {
-                    'type': 'string',
-                    'description': 'Event time in HH:MM format (e.g. "14:00" for 2 PM)'
-                },
-                'duration': {
-                    'type': 'integer',
-                    'description': 'Event duration in minutes (default: 60)'
-                },
-                'description': {
-                    'type': 'string',
-                    'description': 'Event description/notes (optional)'
-                }
-            },
-            'required': ['title', 'date', 'time']
-        }
-    },
-    {
-        'name': 'list_calendar_events',
-        'description': 'List events from Google Calendar. Use this when user wants to see/check their schedule.',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'date': {
-                    'type': 'string',
-                    'description': 'Specific date in YYYY-MM-DD format. If provided, only shows events on that date. Leave empty to show upcoming events.'
-                },
-                'days': {
-                    'type': 'integer',
-                    'description': 'Number of days to fetch (default: 7). Only used if date is not provided.'
-                }
-            },
-            'required': []
-        }
-    },
-    {
-        'name': 'update_calendar_event',
-        'description': 'Update an existing event in Google Calendar. Use this when user wants to modify/change an event.',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'event_id': {
-                    'type': 'string',
-                    'description': 'Event ID to update (get from list_calendar_events)'
-                },
-                'title': {
-                    'type': 'string',
-                    'description': 'New title (optional)'
-                },
-                'date': {
-                    'type': 'string',
-                    'description': 'New date in YYYY-MM-DD format (optional)'
-                },
-                'time': {
-                    'type': 'string',
-                    'description': 'New time in HH:MM format (optional)'
-                },
-                'duration': {
-                    'type': 'integer',
-                    'description': 'New duration in minutes (optional)'
-                },
-                'description': {
-                    'type': 'string',
-                    'description': 'New description (optional)'
-                }
-            },
-            'required': ['event_id']
-        }
-    },
-    {
-        'name': 'delete_calendar_event',
-        'description': 'Delete an event from Google Calendar. Use this when user wants to remove/cancel an event.',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'event_id': {
-                    'type': 'string',
-                    'description': 'Event ID to delete (get from list_calendar_events)'
-                }
-            },
-            'required': ['event_id']
-        }
-    }
-]
\ No newline at end of file
+def _freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+# Schema lives in calendar_tools_schema.json; parsed once and frozen so
+# callers can't mutate the shared declarations
+with open(os.path.join(os.path.dirname(__file__), 'calendar_tools_schema.json'), encoding='utf-8') as _f:
+    CALENDAR_TOOLS = _freeze(json.load(_f))
@@ -1,13 +1,81 @@
 import discord
 from discord.ext import commands
+from agent.cache import LRUCache
 from agent.llm_agent import LLMAgent
 import logging
 import json
+import asyncio
+import re
+import time
+from datetime import date
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shown right away, then edited into the real reply
+THINKING_MESSAGE = "🤔 Thinking..."
+# Discord's message length limit
+MAX_MESSAGE_LENGTH = 2000
+
+# Per-channel send pacing (Discord allows ~5 messages / 5 s per channel)
+SEND_BURST = 5
+SEND_RATE = 1.0  # tokens per second
+
+# Seconds a rendered !stats embed is reused
+STATS_TTL = 30
+
+# Parsed !cal intents are reused for identical commands on the same day
+INTENT_CACHE_SIZE = 2048
+INTENT_CACHE_TTL = 300
+
+# Reply to a !cal command that couldn't be understood
+CAL_HELP_MESSAGE = (
+    "❌ Tidak bisa memahami perintah calendar.\n\n"
+    "**Contoh perintah:**\n"
+    "• `!cal buatkan meeting besok jam 2 siang`\n"
+    "• `!cal jadwalkan interview jumat pukul 10 pagi selama 2 jam`\n"
+    "• `!cal tampilkan jadwal hari ini`\n"
+    "• `!cal apa jadwalku minggu ini`\n"
+    "• `!cal hapus event abc123`\n"
+    "• `!cal update event abc123 judulnya jadi meeting penting`"
+)
+
+# Trivial !cal commands resolved locally, without the LLM intent parser
+_FAST_INTENTS = (
+    (re.compile(r"^(?:list|show|events|tampilkan|jadwal)(?:\s+(\d+))?$", re.I),
+     lambda m: {'action': 'read', 'days': int(m.group(1) or 7)}),
+    # Only an explicit "event <id>" whose id looks like a Calendar event ID
+    # (10+ chars, has a digit) - "hapus rapat" must go through the LLM
+    (re.compile(r"^(?:hapus|delete|cancel)\s+event\s+((?=[a-z_]*\d)[a-z0-9_]{10,})$", re.I),
+     lambda m: {'action': 'delete', 'event_id': m.group(1)}),
+)
+
+def _fast_intent(command: str):
+    """Intent for a trivial !cal command (list/delete), or None"""
+    command = command.strip()
+    for pattern, build in _FAST_INTENTS:
+        match = pattern.match(command)
+        if match:
+            return build(match)
+    return None
+
+def _iter_chunks(text: str, size: int = MAX_MESSAGE_LENGTH):
+    """
+    Yield pieces of text no longer than size
+    
+    Cuts at the last newline inside each window when there is one, so
+    markdown lines and code blocks aren't broken mid-line.
+    """
+    start = 0
+    length = len(text)
+    while length - start > size:
+        cut = text.rfind('\n', start, start + size)
+        if cut <= start:
+            cut = start + size
+        yield text[start:cut]
+        start = cut + 1 if text[cut:cut+1] == '\n' else cut
+    if start < length or start == 0:
+        yield text[start:]
+
 class DiscordBot:
     """Discord Bot with LLM Agent integration"""
     
@@ -25,12 +93,45 @@ class DiscordBot:
         self.agent = agent
         self.calendar_agent = calendar_agent
         
-        # Setup bot with intents
-        intents = discord.Intents.default()
+        # Agent calls in flight, keyed by (user_id, message) - duplicates share one
+        self._inflight = {}
+        
+        # Token buckets per channel id: (tokens, last refill time)
+        self._channel_buckets = LRUCache(maxsize=1024)
+        
+        # Parsed intents keyed by (day, normalized command)
+        self._intent_cache = LRUCache(maxsize=INTENT_CACHE_SIZE, ttl=INTENT_CACHE_TTL)
+        
+        # !cal intent action -> handler
+        self._action_handlers = {
+            'create': self._do_create,
+            'read': self._do_read,
+            'update': self._do_update,
+            'delete': self._do_delete
+        }
+        
+        # !help never changes; !stats is refreshed every STATS_TTL seconds
+        self._help_embed = self._build_help_embed()
+        self._stats_cache = LRUCache(maxsize=1, ttl=STATS_TTL)
+        
+        # Setup bot with only the intents it uses (guild + DM text messages)
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_messages = True
+        intents.dm_messages = True
         intents.message_content = True
-        intents.members = True
         
-        self.bot = commands.Bot(command_prefix=prefix, intents=intents, help_command=None)
+        # No member list: message authors come with each message payload
+        self.bot = commands.Bot(
+            command_prefix=prefix,
+            intents=intents,
+            help_command=None,
+            max_messages=1000,
+            chunk_guilds_at_startup=False,
+            member_cache_flags=discord.MemberCacheFlags.none(),
+            # LLM output must never ping @everyone, roles or users
+            allowed_mentions=discord.AllowedMentions.none()
+        )
         
         # Register events and commands
         self._register_events()
@@ -75,16 +176,12 @@ class DiscordBot:
                 async with message.channel.typing():
                     user_id = str(message.author.id)
                     
-                    # Gunakan agent.process() yang sudah support function calling
-                    response = self.agent.process(user_id, message.content)
+                    # Async agent call - other users' messages keep flowing meanwhile
+                    response = await self._chat(user_id, message.content)
                     
                     # Send response (split if too long)
-                    if len(response) > 2000:
-                        chunks = [response[i:i+2000] for i in range(0, len(response), 2000)]
-                        for chunk in chunks:
-                            await message.channel.send(chunk)
-                    else:
-                        await message.channel.send(response)
+                    for chunk in _iter_chunks(response):
+                        await self._send(message.channel, chunk)
                     
                     logger.info(f"User {message.author.name} chatted: {message.content[:50]}...")
                     
@@ -96,10 +193,12 @@ class DiscordBot:
         async def on_command_error(ctx, error):
             if isinstance(error, commands.MissingRequiredArgument):
                 await ctx.send("❌ Missing argument! Use `!help` for command usage.")
-            elif isinstance(error, commands.CommandNotFound):
-                pass  # Ignore command not found errors
+            elif isinstance(error, (commands.CommandNotFound,
+                                    commands.CommandOnCooldown,
+                                    commands.BotMissingPermissions)):
+                pass  # Nothing the user can act on - don't add channel traffic
             else:
-                logger.error(f"Error: {error}")
+                logger.error("Command error: %s", error, exc_info=error)
                 await ctx.send(f"❌ An error occurred: {str(error)}")
     
     def _register_commands(self):
@@ -110,7 +209,7 @@ class DiscordBot:
             """Debug: Test intent parsing without executing"""
             try:
                 async with ctx.typing():
-                    intent = self.agent.parse_calendar_intent(command)
+                    intent = await self._parse_intent(command)
                     
                     if intent:
                         # Format intent for display
@@ -128,29 +227,25 @@ class DiscordBot:
         @self.bot.command(name='chat', help='Chat with AI')
         async def chat(ctx, *, message: str):
             """Chat with the AI"""
+            placeholder = None
             try:
-                # Show typing indicator
-                async with ctx.typing():
-                    # Get user ID
-                    user_id = str(ctx.author.id)
-                    
-                    # Get AI response
-                    response = self.agent.chat(user_id, message)
-                    
-                    # Send response (split if too long)
-                    if len(response) > 2000:
-                        # Split into chunks
-                        chunks = [response[i:i+2000] for i in range(0, len(response), 2000)]
-                        for chunk in chunks:
-                            await ctx.send(chunk)
-                    else:
-                        await ctx.send(response)
-                    
-                    logger.info(f"User {ctx.author.name} chatted: {message[:50]}...")
-                    
+                # Instant feedback while Gemini works
+                placeholder = await ctx.send(THINKING_MESSAGE)
+                
+                # Get user ID
+                user_id = str(ctx.author.id)
+                
+                # Get AI response
+                response = await self._chat(user_id, message)
+                
+                # Replace the placeholder (split if too long)
+                await self._deliver(placeholder, ctx.channel, response)
+                
+                logger.info(f"User {ctx.author.name} chatted: {message[:50]}...")
+                
             except Exception as e:
                 logger.error(f"Chat error: {e}")
-                await ctx.send(f"❌ Error: {str(e)}")
+                await self._deliver(placeholder, ctx.channel, f"❌ Error: {str(e)}")
         
         @self.bot.command(name='clear', help='Clear your chat history')
         async def clear(ctx):
@@ -167,65 +262,32 @@ class DiscordBot:
             @self.bot.command(name='cal', help='Natural language calendar command')
             async def calendar_natural(ctx, *, command: str):
                 """Process natural language calendar command"""
+                placeholder = None
                 try:
-                    async with ctx.typing():
-                        # Parse intent
-                        intent = self.agent.parse_calendar_intent(command)
-                        
-                        if not intent:
-                            await ctx.send(
-                                "❌ Tidak bisa memahami perintah calendar.\n\n"
-                                "**Contoh perintah:**\n"
-                                "• `!cal buatkan meeting besok jam 2 siang`\n"
-                                "• `!cal jadwalkan interview jumat pukul 10 pagi selama 2 jam`\n"
-                                "• `!cal tampilkan jadwal hari ini`\n"
-                                "• `!cal apa jadwalku minggu ini`\n"
-                                "• `!cal hapus event abc123`\n"
-                                "• `!cal update event abc123 judulnya jadi meeting penting`"
-                            )
-                            return
-                        
-                        # Execute action
-                        action = intent.get('action')
-                        
-                        if action == 'create':
-                            result = self.calendar_agent.create_event(
-                                title=intent.get('title', 'Untitled Event'),
-                                date=intent['date'],
-                                time=intent['time'],
-                                duration=intent.get('duration', 60),
-                                description=intent.get('description', '')
-                            )
-                        
-                        elif action == 'read':
-                            result = self.calendar_agent.read_events(
-                                date=intent.get('date'),
-                                days=intent.get('days', 7)
-                            )
-                        
-                        elif action == 'update':
-                            update_data = {k: v for k, v in intent.items() 
-                                          if k not in ['action', 'event_id'] and v}
-                            result = self.calendar_agent.update_event(
-                                event_id=intent['event_id'],
-                                **update_data
-                            )
-                        
-                        elif action == 'delete':
-                            result = self.calendar_agent.delete_event(
-                                event_id=intent['event_id']
-                            )
-                        
-                        else:
-                            result = {'success': False, 'message': '❌ Unknown action'}
-                        
-                        # Send response
-                        await ctx.send(result['message'])
-                        logger.info(f"Calendar action '{action}' by {ctx.author.name}: {command[:50]}")
-                        
+                    placeholder = await ctx.send(THINKING_MESSAGE)
+                    
+                    # Parse intent (trivial commands skip the LLM)
+                    intent = _fast_intent(command) or await self._parse_intent(command)
+                    
+                    if not intent:
+                        await placeholder.edit(content=CAL_HELP_MESSAGE)
+                        return
+                    
+                    # Execute action
+                    action = intent.get('action')
+                    handler = self._action_handlers.get(action)
+                    if handler is not None:
+                        result = await handler(intent)
+                    else:
+                        result = {'success': False, 'message': '❌ Unknown action'}
+                    
+                    # Replace the placeholder with the result
+                    await self._deliver(placeholder, ctx.channel, result['message'])
+                    logger.info(f"Calendar action '{action}' by {ctx.author.name}: {command[:50]}")
+                    
                 except Exception as e:
                     logger.error(f"Calendar command error: {e}")
-                    await ctx.send(f"❌ Error: {str(e)}")
+                    await self._deliver(placeholder, ctx.channel, f"❌ Error: {str(e)}")
             
             @self.bot.command(name='create_event', help='Create calendar event manually')
             async def create_event(ctx, title: str, date: str, time: str, duration: int = 60):
@@ -236,7 +298,7 @@ class DiscordBot:
                 """
                 try:
                     async with ctx.typing():
-                        result = self.calendar_agent.create_event(
+                        result = await self.calendar_agent.create_event_async(
                             title=title,
                             date=date,
                             time=time,
@@ -256,7 +318,7 @@ class DiscordBot:
                 """
                 try:
                     async with ctx.typing():
-                        result = self.calendar_agent.read_events(days=days)
+                        result = await self.calendar_agent.read_events_async(days=days)
                         await ctx.send(result['message'])
                         logger.info(f"List events by {ctx.author.name}: {days} days")
                 except Exception as e:
@@ -271,7 +333,9 @@ class DiscordBot:
                 """
                 try:
                     async with ctx.typing():
-                        result = self.calendar_agent.delete_event(event_id=event_id)
+                        result = await self.calendar_agent.delete_event_async(
+                            event_id=event_id, echo_title=True
+                        )
                         await ctx.send(result['message'])
                         logger.info(f"Delete event by {ctx.author.name}: {event_id}")
                 except Exception as e:
@@ -287,7 +351,7 @@ class DiscordBot:
                 try:
                     async with ctx.typing():
                         update_data = {field: value}
-                        result = self.calendar_agent.update_event(
+                        result = await self.calendar_agent.update_event_async(
                             event_id=event_id,
                             **update_data
                         )
@@ -301,32 +365,19 @@ class DiscordBot:
         @self.bot.command(name='help', help='Show help message')
         async def help_command(ctx):
             """Show help message"""
-            help_text = self.agent.get_help()
-            
-            embed = discord.Embed(
-                title="🤖 Bot Help & Commands",
-                description=help_text,
-                color=discord.Color.blue()
-            )
-            
-            if self.calendar_agent:
-                embed.set_footer(text="Made with ❤️ using Gemini AI & Google Calendar")
-            else:
-                embed.set_footer(text="Made with ❤️ using Gemini AI")
-            
-            await ctx.send(embed=embed)
+            await ctx.send(embed=self._help_embed)
         
         @self.bot.command(name='stats', help='Show bot statistics')
         async def stats(ctx):
             """Show bot statistics"""
-            stats_text = self.agent.get_stats()
-            
-            embed = discord.Embed(
-                title="📊 Bot Statistics",
-                description=stats_text,
-                color=discord.Color.green()
-            )
+            def build_embed():
+                return discord.Embed(
+                    title="📊 Bot Statistics",
+                    description=self.agent.get_stats(),
+                    color=discord.Color.green()
+                )
             
+            embed = self._stats_cache.get_or_set('stats', build_embed)
             await ctx.send(embed=embed)
         
         @self.bot.command(name='ping', help='Check bot latency')
@@ -335,6 +386,129 @@ class DiscordBot:
             latency = round(self.bot.latency * 1000)
             await ctx.send(f"🏓 Pong! Latency: {latency}ms")
     
+    def _build_help_embed(self) -> discord.Embed:
+        """Build the !help embed (its content is fixed for the bot's lifetime)"""
+        embed = discord.Embed(
+            title="🤖 Bot Help & Commands",
+            description=self.agent.get_help(),
+            color=discord.Color.blue()
+        )
+        
+        if self.calendar_agent:
+            embed.set_footer(text="Made with ❤️ using Gemini AI & Google Calendar")
+        else:
+            embed.set_footer(text="Made with ❤️ using Gemini AI")
+        
+        return embed
+    
+    async def _parse_intent(self, command: str):
+        """
+        Parse a calendar command, reusing today's result for repeats
+        
+        The day is part of the key - "besok" resolves to a different date
+        tomorrow. Failed parses are not cached.
+        """
+        key = (date.today(), command.strip().lower())
+        intent = self._intent_cache.get(key)
+        if intent is not None:
+            logger.info("⚡ Intent cache hit")
+            return intent
+        
+        intent = await asyncio.to_thread(self.agent.parse_calendar_intent, command)
+        if intent:
+            self._intent_cache[key] = intent
+        return intent
+    
+    # ===== !cal ACTION HANDLERS =====
+    
+    async def _do_create(self, intent: dict) -> dict:
+        """Create the event described by a !cal intent"""
+        return await self.calendar_agent.create_event_async(
+            title=intent.get('title', 'Untitled Event'),
+            date=intent['date'],
+            time=intent['time'],
+            duration=intent.get('duration', 60),
+            description=intent.get('description', '')
+        )
+    
+    async def _do_read(self, intent: dict) -> dict:
+        """List events for a !cal intent"""
+        return await self.calendar_agent.read_events_async(
+            date=intent.get('date'),
+            days=intent.get('days', 7)
+        )
+    
+    async def _do_update(self, intent: dict) -> dict:
+        """Apply the non-empty fields of a !cal intent to its event"""
+        update_data = {k: v for k, v in intent.items()
+                       if k not in ('action', 'event_id') and v}
+        return await self.calendar_agent.update_event_async(
+            event_id=intent['event_id'],
+            **update_data
+        )
+    
+    async def _do_delete(self, intent: dict) -> dict:
+        """Delete the event named by a !cal intent"""
+        return await self.calendar_agent.delete_event_async(
+            event_id=intent['event_id'],
+            echo_title=True
+        )
+    
+    async def _chat(self, user_id: str, message: str) -> str:
+        """
+        Get the agent's reply, coalescing identical in-flight requests
+        
+        A user re-sending the same message while the first is still being
+        answered waits for that answer instead of paying for a second Gemini
+        call. Turns of one user are already serialized inside LLMAgent.
+        """
+        key = (user_id, message)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.agent.chat_async(user_id, message))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.info(f"🔁 Joined in-flight request of user {user_id}")
+        
+        # One waiter giving up must not cancel the shared call
+        return await asyncio.shield(task)
+    
+    async def _send(self, channel, content: str):
+        """
+        Send a message, pacing bursts with a per-channel token bucket
+        
+        Long replies go out as several messages; spacing them here keeps the
+        bot under Discord's per-channel limit instead of running into 429s.
+        """
+        now = time.monotonic()
+        tokens, last = self._channel_buckets.get(channel.id) or (SEND_BURST, now)
+        tokens = min(SEND_BURST, tokens + (now - last) * SEND_RATE) - 1
+        self._channel_buckets[channel.id] = (tokens, now)
+        
+        # A negative balance reserves a future token - wait until it's refilled
+        if tokens < 0:
+            await asyncio.sleep(-tokens / SEND_RATE)
+        return await channel.send(content)
+    
+    async def _deliver(self, placeholder, channel, text: str):
+        """
+        Show a reply in place of the "thinking" placeholder
+        
+        Args:
+            placeholder: Message to edit (None if it was never sent)
+            channel: Channel for the overflow messages
+            text: Reply text; parts beyond 2000 chars go out as new messages
+        """
+        chunks = _iter_chunks(text)
+        first = next(chunks)
+        if placeholder is not None:
+            await placeholder.edit(content=first)
+        else:
+            await self._send(channel, first)
+        for chunk in chunks:
+            await self._send(channel, chunk)
+    
     def run(self):
         """Start the bot"""
         logger.info("🚀 Starting Discord bot...")
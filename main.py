@@ -1,17 +1,116 @@
+import asyncio
 import os
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from agent.llm_agent import LLMAgent
-from agent.tools import calendar_tools
-from bot.discord_bot import DiscordBot
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Console text, built once and written in one call each
+_RULE = "=" * 60
+
+_BANNER = f"""{_RULE}
+🤖 Starting LLM Discord Bot with Calendar Integration
+{_RULE}
+📝 Bot Prefix: {{bot_prefix}}
+🧠 LLM Model: {{llm_model}}
+{_RULE}
+"""
+
+_CALENDAR_SETUP_HELP = """
+💡 To enable calendar features:
+   1. Go to: https://console.cloud.google.com/
+   2. Enable Google Calendar API
+   3. Create OAuth 2.0 credentials (Desktop app)
+   4. Download credentials.json
+   5. Place in: credentials/credentials.json
+"""
+
+_COMMANDS_HELP = """
+📋 Available Commands:
+   • !chat <message> - Chat with AI
+   • !help - Show all commands
+   • !stats - Bot statistics
+   • !ping - Check latency
+   • !clear - Clear chat history
+"""
+
+_CALENDAR_COMMANDS_HELP = """
+📅 Calendar Commands (Natural Language):
+   Just chat naturally without prefix! Examples:
+   • 'Tambahkan jadwal rapat besok jam 10 pagi'
+   • 'Apa jadwalku hari ini?'
+   • 'Lihat agenda minggu ini'
+   • 'Hapus event [event_id]'
+
+   Or use explicit commands:
+   • !list_events - List upcoming events
+"""
+
+_TROUBLESHOOTING = """
+💡 Troubleshooting:
+   1. Check if DISCORD_TOKEN is valid
+   2. Check if GEMINI_API_KEY is valid
+   3. Check internet connection
+   4. Ensure MESSAGE CONTENT INTENT is enabled in Discord Developer Portal
+   5. For calendar: ensure credentials.json exists
+   6. Check logs above for detailed error
+"""
+
+def init_calendar(credentials_path: str, token_path: str):
+    """Authenticate the shared CalendarAgent and open its API connection"""
+    from agent.tools import calendar_tools
+    
+    calendar_agent = calendar_tools.init_calendar_agent(
+        credentials_path=credentials_path,
+        token_path=token_path
+    )
+    calendar_agent.warm_up()
+    return calendar_agent
+
+def _write(text: str):
+    """Write a console block with a single write + flush"""
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+def setup_logging() -> QueueListener:
+    """
+    Route all logging through a queue drained by a background thread
+    
+    Callers (including the bot's event loop) only enqueue records; formatting
+    and the stderr write happen on the listener thread.
+    
+    Returns:
+        QueueListener: Started listener - stop() it on exit to flush
+    """
+    log_queue = queue.Queue(-1)
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    # Queued records carry the bare message; the console handler formats it
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler], force=True)
+    listener = QueueListener(log_queue, console, respect_handler_level=True)
+    listener.start()
+    return listener
+
+def use_uvloop() -> bool:
+    """Run the bot on uvloop when it's installed (not available on Windows)"""
+    if sys.platform == "win32":
+        return False
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
 def main():
     """Main entry point"""
     
@@ -28,6 +127,9 @@ def main():
     credentials_path = os.getenv("GOOGLE_CREDENTIALS_PATH", "credentials/credentials.json")
     token_path = os.getenv("GOOGLE_TOKEN_PATH", "credentials/token.json")
     
+    # Chat histories are kept here across restarts
+    sessions_path = os.getenv("SESSIONS_PATH", "sessions.json")
+    
     # Validate credentials
     if not discord_token:
         print("❌ DISCORD_TOKEN not found in .env!")
@@ -39,52 +141,70 @@ def main():
         print("💡 Get your key from: https://aistudio.google.com/app/apikey")
         return
     
-    print("="*60)
-    print("🤖 Starting LLM Discord Bot with Calendar Integration")
-    print("="*60)
-    print(f"📝 Bot Prefix: {bot_prefix}")
-    print(f"🧠 LLM Model: {llm_model}")
-    print("="*60)
+    # Heavy imports (discord, Gemini, Google API clients) only once config is valid
+    from agent.llm_agent import LLMAgent
+    from bot.discord_bot import DiscordBot
+    
+    # Decorative output only helps someone watching a terminal
+    interactive = sys.stdout.isatty()
+    if interactive:
+        _write(_BANNER.format(bot_prefix=bot_prefix, llm_model=llm_model))
+    
+    # Stop on SIGTERM the same way as on Ctrl+C, so sessions get saved
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
     
+    agent = None
     try:
-        # Initialize Calendar Tools first (if credentials exist)
+        # Calendar OAuth/warm-up and LLM Agent setup are independent - overlap them
+        has_credentials = os.path.exists(credentials_path)
         enable_calendar = False
-        if os.path.exists(credentials_path):
-            print("\n📅 Initializing Calendar Tools...")
-            try:
-                calendar_tools.init_calendar_agent(
-                    credentials_path=credentials_path,
-                    token_path=token_path
-                )
-                enable_calendar = True
-                print("✅ Calendar Tools initialized!")
-                print("   Calendar features: ENABLED (Function Calling)")
-            except FileNotFoundError as e:
-                print(f"⚠️  Calendar setup incomplete: {e}")
-                print("   Calendar features: DISABLED")
-            except Exception as e:
-                print(f"⚠️  Calendar initialization error: {e}")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            if has_credentials:
+                print("\n📅 Initializing Calendar Tools...")
+                calendar_future = executor.submit(init_calendar, credentials_path, token_path)
+            
+            print("\n🧠 Initializing LLM Agent with Function Calling...")
+            agent_future = executor.submit(
+                LLMAgent,
+                api_key=gemini_api_key,
+                model_name=llm_model,
+                enable_calendar=has_credentials
+            )
+            
+            if has_credentials:
+                try:
+                    calendar_future.result()
+                    enable_calendar = True
+                    print("✅ Calendar Tools initialized!")
+                    print("   Calendar features: ENABLED (Function Calling)")
+                except FileNotFoundError as e:
+                    print(f"⚠️  Calendar setup incomplete: {e}")
+                    print("   Calendar features: DISABLED")
+                except Exception as e:
+                    print(f"⚠️  Calendar initialization error: {e}")
+                    print("   Calendar features: DISABLED")
+            else:
+                print("\n⚠️  Google Calendar credentials not found")
+                print(f"   Expected path: {credentials_path}")
                 print("   Calendar features: DISABLED")
-        else:
-            print("\n⚠️  Google Calendar credentials not found")
-            print(f"   Expected path: {credentials_path}")
-            print("   Calendar features: DISABLED")
-            print("\n💡 To enable calendar features:")
-            print("   1. Go to: https://console.cloud.google.com/")
-            print("   2. Enable Google Calendar API")
-            print("   3. Create OAuth 2.0 credentials (Desktop app)")
-            print("   4. Download credentials.json")
-            print("   5. Place in: credentials/credentials.json")
+                _write(_CALENDAR_SETUP_HELP)
+            
+            agent = agent_future.result()
         
-        # Initialize LLM Agent with calendar integration
-        print("\n🧠 Initializing LLM Agent with Function Calling...")
-        agent = LLMAgent(
-            api_key=gemini_api_key,
-            model_name=llm_model,
-            enable_calendar=enable_calendar
-        )
+        # Agent was built expecting the calendar; rebuild without its tools
+        if has_credentials and not enable_calendar:
+            agent.close()
+            agent = LLMAgent(
+                api_key=gemini_api_key,
+                model_name=llm_model,
+                enable_calendar=False
+            )
         print("✅ LLM Agent initialized with Function Calling!")
         
+        restored = agent.load_sessions(sessions_path)
+        if restored:
+            print(f"📂 Restored {restored} chat session(s)")
+        
         # Initialize Discord Bot
         print("\n🤖 Initializing Discord Bot...")
         bot = DiscordBot(
@@ -96,40 +216,40 @@ def main():
         print("✅ Discord Bot initialized!")
         
         # Show available commands
-        print("\n📋 Available Commands:")
-        print("   • !chat <message> - Chat with AI")
-        print("   • !help - Show all commands")
-        print("   • !stats - Bot statistics")
-        print("   • !ping - Check latency")
-        print("   • !clear - Clear chat history")
-        
-        if enable_calendar:
-            print("\n📅 Calendar Commands (Natural Language):")
-            print("   Just chat naturally without prefix! Examples:")
-            print("   • 'Tambahkan jadwal rapat besok jam 10 pagi'")
-            print("   • 'Apa jadwalku hari ini?'")
-            print("   • 'Lihat agenda minggu ini'")
-            print("   • 'Hapus event [event_id]'")
-            print("\n   Or use explicit commands:")
-            print("   • !list_events - List upcoming events")
+        if interactive:
+            if enable_calendar:
+                _write(_COMMANDS_HELP + _CALENDAR_COMMANDS_HELP)
+            else:
+                _write(_COMMANDS_HELP)
         
         # Run bot
-        print("\n🚀 Starting bot...\n")
-        print("="*60)
+        if use_uvloop():
+            print("\n⚡ Event loop: uvloop")
+        if interactive:
+            _write(f"\n🚀 Starting bot...\n\n{_RULE}\n")
+        else:
+            print("\n🚀 Starting bot...")
         bot.run()
         
     except KeyboardInterrupt:
         print("\n\n⏹️  Bot stopped by user")
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
-        print(f"\n❌ Error: {e}")
-        print("\n💡 Troubleshooting:")
-        print("   1. Check if DISCORD_TOKEN is valid")
-        print("   2. Check if GEMINI_API_KEY is valid")
-        print("   3. Check internet connection")
-        print("   4. Ensure MESSAGE CONTENT INTENT is enabled in Discord Developer Portal")
-        print("   5. For calendar: ensure credentials.json exists")
-        print("   6. Check logs above for detailed error")
+        _write(f"\n❌ Error: {e}\n" + _TROUBLESHOOTING)
+    finally:
+        if agent is not None:
+            try:
+                agent.save_sessions(sessions_path)
+            except Exception as e:
+                logger.error(f"Could not save chat sessions: {e}")
+
+def run():
+    """Console entry point: main() with queued logging set up around it"""
+    listener = setup_logging()
+    try:
+        main()
+    finally:
+        listener.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run()
\ No newline at end of file
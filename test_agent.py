@@ -23,7 +23,7 @@ def test_agent():
     
     # Initialize calendar tools
     print("\n1️⃣ Initializing calendar tools...")
-    calendar_tools.initialize_calendar_agent()
+    calendar_tools.init_calendar_agent()
     print("   ✅ Done!")
     
     # Initialize agent with calendar
@@ -5,6 +5,9 @@ Test calendar tools wrapper
 from agent.tools import calendar_tools
 from datetime import datetime, timedelta
 
+# Resolved once at import so every step targets the same day
+TOMORROW = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+
 def test_wrapper():
     print("=" * 60)
     print("🧪 TESTING CALENDAR TOOLS WRAPPER")
@@ -12,7 +15,7 @@ def test_wrapper():
     
     # Initialize (sekarang path default udah bener)
     print("\n1️⃣ Initializing calendar agent...")
-    success = calendar_tools.initialize_calendar_agent()
+    success = calendar_tools.init_calendar_agent()
     
     if not success:
         print("   ❌ Failed to initialize. Check credentials.")
@@ -21,10 +24,9 @@ def test_wrapper():
     
     # Test add
     print("\n2️⃣ Testing add_calendar_event...")
-    tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
     result = calendar_tools.add_calendar_event(
         title="🧪 Test from Wrapper",
-        date=tomorrow,
+        date=TOMORROW,
         time="14:00",
         duration=60
     )
@@ -38,7 +40,8 @@ def test_wrapper():
     # Test list
     print("\n3️⃣ Testing list_calendar_events...")
     result = calendar_tools.list_calendar_events(days=7)
-    print(result['message'][:500] + "..." if len(result['message']) > 500 else result['message'])
+    msg = result['message']
+    print(msg[:500] + "..." if len(msg) > 500 else msg)
     
     # Test update
     print("\n4️⃣ Testing update_calendar_event...")
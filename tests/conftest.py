@@ -2,6 +2,7 @@
 Pytest fixtures for testing SchedBot
 """
 import pytest
+from contextlib import ExitStack
 from unittest.mock import Mock, MagicMock, patch
 from datetime import datetime
 import sys
@@ -10,12 +11,16 @@ import os
 # Add parent dir to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from agent.calendar_agent import CalendarAgent
+from agent.llm_agent import LLMAgent
+from agent.tools import calendar_tools
+
 
 # ==========================================
-# MOCK DATA
+# MOCK DATA (read-only, shared by all tests)
 # ==========================================
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_event_data():
     """Sample event data for testing"""
     return {
@@ -27,7 +32,7 @@ def sample_event_data():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_calendar_api_response():
     """Mock Google Calendar API response"""
     return {
@@ -46,7 +51,7 @@ def sample_calendar_api_response():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_events_list():
     """Mock list of events from Calendar API"""
     return {
@@ -77,6 +82,8 @@ def sample_events_list():
 def mock_calendar_service():
     """Mock Google Calendar API service"""
     mock_service = MagicMock()
+    # Bind events() once instead of re-invoking it for every sub-mock
+    mock_events = mock_service.events.return_value
     
     # Mock events().insert()
     mock_insert = MagicMock()
@@ -85,7 +92,7 @@ def mock_calendar_service():
         'summary': 'Test Meeting',
         'htmlLink': 'https://calendar.google.com/event?eid=test123'
     }
-    mock_service.events().insert.return_value = mock_insert
+    mock_events.insert.return_value = mock_insert
     
     # Mock events().list()
     mock_list = MagicMock()
@@ -99,7 +106,7 @@ def mock_calendar_service():
             }
         ]
     }
-    mock_service.events().list.return_value = mock_list
+    mock_events.list.return_value = mock_list
     
     # Mock events().get()
     mock_get = MagicMock()
@@ -110,48 +117,117 @@ def mock_calendar_service():
         'start': {'dateTime': '2025-10-30T14:00:00+07:00'},
         'end': {'dateTime': '2025-10-30T15:00:00+07:00'}
     }
-    mock_service.events().get.return_value = mock_get
+    mock_events.get.return_value = mock_get
     
-    # Mock events().update()
-    mock_update = MagicMock()
-    mock_update.execute.return_value = {
+    # Mock events().patch()
+    mock_patch = MagicMock()
+    mock_patch.execute.return_value = {
         'summary': 'Updated Meeting',
         'htmlLink': 'https://calendar.google.com/event?eid=test123'
     }
-    mock_service.events().update.return_value = mock_update
+    mock_events.patch.return_value = mock_patch
     
     # Mock events().delete()
     mock_delete = MagicMock()
     mock_delete.execute.return_value = {}
-    mock_service.events().delete.return_value = mock_delete
+    mock_events.delete.return_value = mock_delete
     
     return mock_service
 
 
 @pytest.fixture
-def mock_calendar_agent(mock_calendar_service):
+def empty_events_service(mock_calendar_service):
+    """Calendar service whose events().list() returns no items"""
+    mock_calendar_service.events.return_value.list.return_value.execute.return_value = {'items': []}
+    return mock_calendar_service
+
+
+@pytest.fixture
+def sample_events_service(mock_calendar_service, sample_events_list):
+    """Calendar service whose events().list() returns sample_events_list"""
+    mock_calendar_service.events.return_value.list.return_value.execute.return_value = sample_events_list
+    return mock_calendar_service
+
+
+@pytest.fixture
+def mock_token_file(tmp_path):
+    """Placeholder token.json so auth takes the saved-token path"""
+    # A real file instead of patching os.path.exists for the whole process
+    token_file = tmp_path / 'test_token.json'
+    token_file.write_text('{}')
+    return str(token_file)
+
+
+@pytest.fixture
+def mock_calendar_agent(mock_calendar_service, mock_token_file):
     """Mock CalendarAgent with mocked service"""
-    with patch('agent.calendar_agent.build') as mock_build:
-        mock_build.return_value = mock_calendar_service
+    with ExitStack() as stack:
+        stack.enter_context(patch('googleapiclient.discovery.build', return_value=mock_calendar_service))
+        stack.enter_context(patch('agent.calendar_agent.Credentials'))
+        
+        CalendarAgent.clear_cache()
+        agent = CalendarAgent(
+            credentials_path='test_credentials.json',
+            token_path=mock_token_file,
+            timezone='Asia/Jakarta'
+        )
+        agent.service = mock_calendar_service
         
-        with patch('os.path.exists', return_value=True):
-            with patch('agent.calendar_agent.Credentials'):
-                from agent.calendar_agent import CalendarAgent
-                
-                agent = CalendarAgent(
-                    credentials_path='test_credentials.json',
-                    token_path='test_token.json',
-                    timezone='Asia/Jakarta'
-                )
-                agent.service = mock_calendar_service
-                
-                yield agent
+        yield agent
+
+
+@pytest.fixture
+def mock_tools_agent(monkeypatch):
+    """MagicMock CalendarAgent served by calendar_tools.get_calendar_agent()"""
+    agent = MagicMock()
+    monkeypatch.setattr('agent.tools.calendar_tools.get_calendar_agent', lambda: agent)
+    return agent
+
+
+# ==========================================
+# GEMINI SDK STUB
+# ==========================================
+
+@pytest.fixture(scope="session", autouse=True)
+def _stub_genai():
+    """Patch the Gemini SDK entry points once for the whole session"""
+    with ExitStack() as stack:
+        configure = stack.enter_context(patch('google.generativeai.configure'))
+        model_class = stack.enter_context(patch('google.generativeai.GenerativeModel'))
+        yield configure, model_class
+
+
+@pytest.fixture(autouse=True)
+def _reset_genai(_stub_genai):
+    """Give each test clean SDK stubs (no return values or calls from earlier tests)"""
+    for stub in _stub_genai:
+        stub.reset_mock(return_value=True, side_effect=True)
+
+
+@pytest.fixture
+def mock_configure(_stub_genai):
+    """The session's google.generativeai.configure stub"""
+    return _stub_genai[0]
+
+
+@pytest.fixture
+def mock_model_class(_stub_genai):
+    """The session's google.generativeai.GenerativeModel stub"""
+    return _stub_genai[1]
 
 
 # ==========================================
 # LLM AGENT MOCKS
 # ==========================================
 
+@pytest.fixture
+def mock_chat(mock_model_class):
+    """Fresh chat session returned by GenerativeModel(...).start_chat()"""
+    chat = MagicMock()
+    mock_model_class.return_value.start_chat.return_value = chat
+    return chat
+
+
 @pytest.fixture
 def mock_gemini_model():
     """Mock Gemini GenerativeModel"""
@@ -174,23 +250,45 @@ def mock_gemini_model():
     return mock_model
 
 
+@pytest.fixture(scope="module")
+def llm_agent_nocal(_stub_genai):
+    """Chat-only LLMAgent shared by a module's tests that don't touch sessions"""
+    agent = LLMAgent(api_key="test_key", enable_calendar=False)
+    
+    yield agent
+    agent.close()
+
+
+@pytest.fixture
+def make_llm_agent(_stub_genai):
+    """Factory for chat-only LLMAgents, closed (timers, tool workers) on teardown"""
+    agents = []
+    
+    def make(**kwargs):
+        kwargs.setdefault('api_key', "test_key")
+        kwargs.setdefault('enable_calendar', False)
+        agent = LLMAgent(**kwargs)
+        agents.append(agent)
+        return agent
+    
+    yield make
+    for agent in agents:
+        agent.close()
+
+
 @pytest.fixture
-def mock_llm_agent(mock_gemini_model):
+def mock_llm_agent(mock_gemini_model, mock_model_class):
     """Mock LLMAgent"""
-    with patch('google.generativeai.configure'):
-        with patch('google.generativeai.GenerativeModel') as mock_model_class:
-            mock_model_class.return_value = mock_gemini_model
-            
-            from agent.llm_agent import LLMAgent
-            
-            agent = LLMAgent(
-                api_key="test_api_key",
-                model_name="gemini-1.5-pro",
-                enable_calendar=False
-            )
-            agent.model = mock_gemini_model
-            
-            yield agent
+    mock_model_class.return_value = mock_gemini_model
+    
+    agent = LLMAgent(
+        api_key="test_api_key",
+        model_name="gemini-1.5-pro",
+        enable_calendar=False
+    )
+    agent.model = mock_gemini_model
+    
+    return agent
 
 
 @pytest.fixture
@@ -220,21 +318,24 @@ def mock_function_call_response():
 # CALENDAR TOOLS MOCKS
 # ==========================================
 
+@pytest.fixture(scope="module")
+def calendar_tool_decls():
+    """CALENDAR_TOOLS declarations keyed by tool name (built once per module)"""
+    return {tool['name']: tool for tool in calendar_tools.CALENDAR_TOOLS}
+
+
 @pytest.fixture
-def mock_calendar_tools_agent(mock_calendar_service):
+def mock_calendar_tools_agent(mock_calendar_service, mock_token_file):
     """Mock calendar_tools module's global agent"""
-    with patch('agent.calendar_agent.build') as mock_build:
-        mock_build.return_value = mock_calendar_service
+    with ExitStack() as stack:
+        stack.enter_context(patch('googleapiclient.discovery.build', return_value=mock_calendar_service))
+        stack.enter_context(patch('agent.calendar_agent.Credentials'))
+        
+        # Initialize the global agent
+        agent = calendar_tools.init_calendar_agent(
+            credentials_path='test_cred.json',
+            token_path=mock_token_file
+        )
+        agent.service = mock_calendar_service
         
-        with patch('os.path.exists', return_value=True):
-            with patch('agent.calendar_agent.Credentials'):
-                from agent.tools import calendar_tools
-                
-                # Initialize the global agent
-                agent = calendar_tools.init_calendar_agent(
-                    credentials_path='test_cred.json',
-                    token_path='test_token.json'
-                )
-                agent.service = mock_calendar_service
-                
-                yield calendar_tools
+        yield calendar_tools
@@ -0,0 +1,132 @@
+"""
+Unit tests for the LRU/TTL cache
+"""
+import pytest
+from unittest.mock import patch
+
+from agent.cache import LRUCache, ShardedLRUCache
+
+
+class TestLRUCache:
+    """Test LRU eviction and TTL expiry"""
+    
+    def test_get_and_set(self):
+        """Test basic mapping behaviour"""
+        cache = LRUCache(maxsize=2)
+        cache['a'] = 1
+        
+        assert cache['a'] == 1
+        assert cache.get('missing') is None
+        assert 'a' in cache
+        assert len(cache) == 1
+        
+        with pytest.raises(KeyError):
+            cache['missing']
+    
+    def test_evicts_least_recently_used(self):
+        """Test oldest entry is evicted once maxsize is exceeded"""
+        cache = LRUCache(maxsize=2)
+        cache['a'] = 1
+        cache['b'] = 2
+        cache.get('a')  # 'b' is now least recently used
+        cache['c'] = 3
+        
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert 'c' in cache
+    
+    def test_ttl_expiry(self):
+        """Test entries expire after ttl seconds"""
+        cache = LRUCache(maxsize=10, ttl=60)
+        
+        with patch('agent.cache.time.monotonic', return_value=1000):
+            cache['a'] = 1
+        with patch('agent.cache.time.monotonic', return_value=1059):
+            assert cache.get('a') == 1
+        with patch('agent.cache.time.monotonic', return_value=1061):
+            assert cache.get('a') is None
+            assert len(cache) == 0
+    
+    def test_sliding_ttl_resets_on_access(self):
+        """Test sliding TTL keeps frequently used entries alive"""
+        cache = LRUCache(maxsize=10, ttl=60, sliding=True)
+        
+        with patch('agent.cache.time.monotonic', return_value=1000):
+            cache['a'] = 1
+        with patch('agent.cache.time.monotonic', return_value=1050):
+            assert cache.get('a') == 1
+        with patch('agent.cache.time.monotonic', return_value=1100):
+            assert cache.get('a') == 1
+    
+    def test_delete_and_clear(self):
+        """Test removing entries"""
+        cache = LRUCache()
+        cache['a'] = 1
+        cache['b'] = 2
+        
+        del cache['a']
+        assert 'a' not in cache
+        assert cache.pop('b') == 2
+        
+        cache['c'] = 3
+        cache.clear()
+        assert len(cache) == 0
+    
+    def test_get_or_set_creates_once(self):
+        """Test factory only runs when the key is missing"""
+        cache = LRUCache()
+        calls = []
+        
+        def factory():
+            calls.append(1)
+            return 'value'
+        
+        assert cache.get_or_set('a', factory) == 'value'
+        assert cache.get_or_set('a', factory) == 'value'
+        assert len(calls) == 1
+
+    
+    def test_on_evict_called_for_lru_and_expiry(self):
+        """Test eviction callback fires for size and TTL drops, not explicit deletes"""
+        evicted = []
+        cache = LRUCache(maxsize=1, ttl=60, on_evict=lambda k, v: evicted.append((k, v)))
+        
+        with patch('agent.cache.time.monotonic', return_value=1000):
+            cache['a'] = 1
+            cache['b'] = 2
+        with patch('agent.cache.time.monotonic', return_value=1100):
+            assert cache.get('b') is None
+        cache['c'] = 3
+        del cache['c']
+        
+        assert evicted == [('a', 1), ('b', 2)]
+
+
+class TestShardedLRUCache:
+    """Test the sharded cache behaves like a single mapping"""
+    
+    def test_mapping_across_shards(self):
+        """Test keys spread over shards are all reachable"""
+        cache = ShardedLRUCache(shards=4, maxsize=100)
+        for i in range(20):
+            cache[f'user{i}'] = i
+        
+        assert len(cache) == 20
+        assert cache['user7'] == 7
+        assert 'user19' in cache
+        assert sorted(cache) == sorted(f'user{i}' for i in range(20))
+        assert sum(1 for shard in cache._shards if len(shard)) > 1
+    
+    def test_delete_and_clear(self):
+        """Test removing entries from the right shard"""
+        cache = ShardedLRUCache(shards=4)
+        cache['a'] = 1
+        cache['b'] = 2
+        
+        del cache['a']
+        assert 'a' not in cache
+        assert cache.pop('b') == 2
+        assert cache.get_or_set('c', lambda: 3) == 3
+        
+        cache.clear()
+        assert len(cache) == 0
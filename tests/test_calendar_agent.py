@@ -1,6 +1,7 @@
 """
 Unit tests for CalendarAgent CRUD operations
 """
+import logging
 import pytest
 from unittest.mock import patch, MagicMock
 from googleapiclient.errors import HttpError
@@ -44,6 +45,21 @@ class TestCalendarAgentCreate:
         assert result['success'] == True
         assert result['event_id'] == 'test_event_123'
     
+    def test_create_event_reminders(self, mock_calendar_agent):
+        """Test new events carry the shared reminder block"""
+        from agent.calendar_agent import EVENT_REMINDERS
+        
+        mock_calendar_agent.create_event(title='A', date='2025-10-30', time='10:00')
+        mock_calendar_agent.create_event(title='B', date='2025-10-31', time='11:00')
+        
+        calls = mock_calendar_agent.service.events().insert.call_args_list
+        assert calls[-1].kwargs['body']['reminders'] == {
+            'useDefault': False,
+            'overrides': [{'method': 'popup', 'minutes': 30}],
+        }
+        assert calls[-1].kwargs['body']['reminders'] is EVENT_REMINDERS
+        assert calls[-1].kwargs['body']['summary'] == 'B'
+    
     def test_create_event_invalid_date_format(self, mock_calendar_agent):
         """Test creating event with invalid date format"""
         result = mock_calendar_agent.create_event(
@@ -86,21 +102,35 @@ class TestCalendarAgentRead:
         assert result['success'] == True
         assert 'events' in result
     
-    def test_read_events_no_events(self, mock_calendar_agent):
-        """Test reading when no events exist"""
-        # Mock empty response
-        mock_calendar_agent.service.events().list().execute.return_value = {'items': []}
+    def test_read_events_specific_date_bounds(self, mock_calendar_agent):
+        """Test a specific date queries exactly that UTC day"""
+        mock_calendar_agent.read_events(date='2025-12-31')
         
+        call_kwargs = mock_calendar_agent.service.events().list.call_args.kwargs
+        assert call_kwargs['timeMin'] == '2025-12-31T00:00:00Z'
+        assert call_kwargs['timeMax'] == '2026-01-01T00:00:00Z'
+    
+    def test_read_events_range_uses_single_now(self, mock_calendar_agent):
+        """Test the upcoming-range window spans exactly `days` from one snapshot"""
+        from datetime import datetime, timedelta
+        
+        mock_calendar_agent.read_events(days=3)
+        
+        call_kwargs = mock_calendar_agent.service.events().list.call_args.kwargs
+        time_min = datetime.fromisoformat(call_kwargs['timeMin'].rstrip('Z'))
+        time_max = datetime.fromisoformat(call_kwargs['timeMax'].rstrip('Z'))
+        assert time_max - time_min == timedelta(days=3)
+    
+    def test_read_events_no_events(self, empty_events_service, mock_calendar_agent):
+        """Test reading when no events exist"""
         result = mock_calendar_agent.read_events(days=7)
         
         assert result['success'] == True
         assert len(result['events']) == 0
         assert 'No events found' in result['message']
     
-    def test_read_events_with_description(self, mock_calendar_agent, sample_events_list):
+    def test_read_events_with_description(self, sample_events_service, mock_calendar_agent):
         """Test reading events that have descriptions"""
-        mock_calendar_agent.service.events().list().execute.return_value = sample_events_list
-        
         result = mock_calendar_agent.read_events(days=7)
         
         assert result['success'] == True
@@ -132,7 +162,10 @@ class TestCalendarAgentUpdate:
         assert result['success'] == True
     
     def test_update_event_datetime(self, mock_calendar_agent):
-        """Test updating event date and time"""
+        """Test updating event date and time sends a partial body via patch"""
+        events = mock_calendar_agent.service.events()
+        events.get.reset_mock()
+        
         result = mock_calendar_agent.update_event(
             event_id='test_event_123',
             date='2025-11-01',
@@ -141,6 +174,11 @@ class TestCalendarAgentUpdate:
         )
         
         assert result['success'] == True
+        body = events.patch.call_args.kwargs['body']
+        assert body['start']['dateTime'] == '2025-11-01T15:00:00'
+        assert body['end']['dateTime'] == '2025-11-01T17:00:00'
+        assert 'summary' not in body
+        events.get.assert_not_called()
     
     def test_update_event_not_found(self, mock_calendar_agent):
         """Test updating non-existent event"""
@@ -149,7 +187,7 @@ class TestCalendarAgentUpdate:
             resp=MagicMock(status=404),
             content=b'Not Found'
         )
-        mock_calendar_agent.service.events().get.side_effect = mock_error
+        mock_calendar_agent.service.events().patch().execute.side_effect = mock_error
         
         result = mock_calendar_agent.update_event(
             event_id='nonexistent_id',
@@ -193,18 +231,44 @@ class TestCalendarAgentDelete:
         )
         mock_calendar_agent.service.events().get.side_effect = mock_error
         
-        result = mock_calendar_agent.delete_event(event_id='nonexistent_id')
+        result = mock_calendar_agent.delete_event(event_id='nonexistent_id', echo_title=True)
         
         assert result['success'] == False
         assert 'not found' in result['message'].lower()
     
     def test_delete_event_shows_title(self, mock_calendar_agent):
-        """Test that delete confirmation shows event title"""
-        result = mock_calendar_agent.delete_event(event_id='test_event_123')
+        """Test that delete confirmation shows event title when asked to"""
+        result = mock_calendar_agent.delete_event(event_id='test_event_123', echo_title=True)
         
         assert result['success'] == True
         # Should show the title of deleted event
         assert 'Test Meeting' in result['message']
+    
+    def test_delete_event_skips_get_by_default(self, mock_calendar_agent):
+        """Test a plain delete is a single API call"""
+        mock_calendar_agent.service.events().get.reset_mock()
+        
+        result = mock_calendar_agent.delete_event(event_id='test_event_123')
+        
+        assert result['success'] == True
+        assert 'test_event_123' in result['message']
+        assert 'Test Meeting' not in result['message']
+        mock_calendar_agent.service.events().get.assert_not_called()
+        mock_calendar_agent.service.events().delete.assert_called_with(
+            calendarId='primary', eventId='test_event_123'
+        )
+    
+    def test_delete_event_without_title_not_found(self, mock_calendar_agent):
+        """Test 404 from delete itself is reported as not found"""
+        mock_calendar_agent.service.events().delete.return_value.execute.side_effect = HttpError(
+            resp=MagicMock(status=404),
+            content=b'Not Found'
+        )
+        
+        result = mock_calendar_agent.delete_event(event_id='missing')
+        
+        assert result['success'] == False
+        assert 'not found' in result['message'].lower()
 
 
 class TestCalendarAgentErrors:
@@ -234,7 +298,7 @@ class TestCalendarAgentErrors:
     
     def test_update_event_generic_error(self, mock_calendar_agent):
         """Test handling generic error during update"""
-        mock_calendar_agent.service.events().get.side_effect = Exception("Network Error")
+        mock_calendar_agent.service.events().patch.side_effect = Exception("Network Error")
         
         result = mock_calendar_agent.update_event(
             event_id='test123',
@@ -242,4 +306,437 @@ class TestCalendarAgentErrors:
         )
         
         assert result['success'] == False
-        assert 'Error' in result['message']
\ No newline at end of file
+        assert 'Error' in result['message']
+    
+    @pytest.mark.parametrize("error, traceback", [
+        (HttpError(resp=MagicMock(status=403, reason='Forbidden'), content=b'forbidden'), False),
+        (KeyError('id'), True),
+    ])
+    def test_api_errors_logged_without_traceback(self, mock_calendar_agent, caplog, error, traceback):
+        """Test Calendar API errors log one line; unexpected errors keep the traceback"""
+        mock_calendar_agent.service.events().list().execute.side_effect = error
+        
+        with caplog.at_level(logging.ERROR, logger='agent.calendar_agent'):
+            result = mock_calendar_agent.read_events(days=7)
+        
+        assert result['success'] == False
+        assert bool(caplog.records[-1].exc_info) == traceback
+    
+    @pytest.mark.parametrize("error, traceback", [
+        (HttpError(resp=MagicMock(status=403, reason='Forbidden'), content=b'forbidden'), False),
+        (KeyError('id'), True),
+    ])
+    def test_delete_errors_logged_without_traceback(self, mock_calendar_agent, caplog, error, traceback):
+        """Test non-404 HttpErrors in delete are logged without a traceback"""
+        mock_calendar_agent.service.events().delete.return_value.execute.side_effect = error
+        
+        with caplog.at_level(logging.ERROR, logger='agent.calendar_agent'):
+            result = mock_calendar_agent.delete_event(event_id='test123')
+        
+        assert result['success'] == False
+        assert bool(caplog.records[-1].exc_info) == traceback
+    
+    def test_warm_up(self, mock_calendar_agent):
+        """Test warm-up makes one cheap call and reports failures"""
+        calendar_list = mock_calendar_agent.service.calendarList().list
+        
+        assert mock_calendar_agent.warm_up() == True
+        calendar_list.assert_called_with(maxResults=1)
+        
+        calendar_list.return_value.execute.side_effect = Exception("Invalid grant")
+        assert mock_calendar_agent.warm_up() == False
+
+
+class TestCalendarAgentAuthCache:
+    """Test in-process credential caching"""
+    
+    def test_second_instance_reuses_cached_service(self, mock_calendar_service):
+        """Test repeated construction skips token file and build()"""
+        with patch('googleapiclient.discovery.build') as mock_build:
+            mock_build.return_value = mock_calendar_service
+            
+            with patch('os.path.exists', return_value=True):
+                with patch('agent.calendar_agent.Credentials') as mock_creds_class:
+                    from agent.calendar_agent import CalendarAgent
+                    
+                    CalendarAgent.clear_cache()
+                    first = CalendarAgent(
+                        credentials_path='cache_cred.json',
+                        token_path='cache_token.json'
+                    )
+                    second = CalendarAgent(
+                        credentials_path='cache_cred.json',
+                        token_path='cache_token.json'
+                    )
+                    
+                    assert second.service is first.service
+                    assert mock_build.call_count == 1
+                    http = mock_build.call_args.kwargs['http']
+                    assert http.credentials is first.creds
+                    assert http.http.timeout == 30
+                    assert mock_creds_class.from_authorized_user_file.call_count == 1
+                    CalendarAgent.clear_cache()
+    
+    def test_invalid_cached_creds_reauthenticate(self, mock_calendar_service):
+        """Test cache miss when cached credentials are no longer valid"""
+        with patch('googleapiclient.discovery.build') as mock_build:
+            mock_build.return_value = mock_calendar_service
+            
+            with patch('os.path.exists', return_value=True):
+                with patch('agent.calendar_agent.Credentials') as mock_creds_class:
+                    from agent.calendar_agent import CalendarAgent
+                    
+                    CalendarAgent.clear_cache()
+                    first = CalendarAgent(
+                        credentials_path='cache_cred.json',
+                        token_path='cache_token.json'
+                    )
+                    first.creds.valid = False
+                    
+                    with patch('builtins.open'), patch('os.makedirs'), \
+                            patch('os.fsync'), patch('os.replace'):
+                        CalendarAgent(
+                            credentials_path='cache_cred.json',
+                            token_path='cache_token.json'
+                        )
+                    
+                    assert mock_build.call_count == 2
+                    CalendarAgent.clear_cache()
+
+
+class TestCalendarAgentTokenRefresh:
+    """Test background token refresh"""
+    
+    def test_refresh_scheduled_before_expiry(self, mock_calendar_agent):
+        """Test timer fires TOKEN_REFRESH_MARGIN before expiry"""
+        from datetime import datetime, timedelta, timezone
+        from agent.calendar_agent import CalendarAgent
+        
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        mock_calendar_agent.creds.expiry = now + timedelta(minutes=65)
+        
+        with patch('agent.calendar_agent.threading.Timer') as mock_timer:
+            mock_calendar_agent._schedule_refresh()
+        
+        delay = mock_timer.call_args.args[0]
+        assert 3500 < delay <= 3600
+        mock_timer.return_value.start.assert_called_once()
+        assert CalendarAgent._refresh_timers[mock_calendar_agent._cache_key] is mock_timer.return_value
+    
+    def test_refresh_token_saves_and_reschedules(self, mock_calendar_agent):
+        """Test refresh callback persists token and schedules next run"""
+        with patch.object(mock_calendar_agent, '_save_token') as mock_save:
+            with patch.object(mock_calendar_agent, '_schedule_refresh') as mock_schedule:
+                mock_calendar_agent._refresh_token()
+        
+        mock_calendar_agent.creds.refresh.assert_called_once()
+        mock_save.assert_called_once_with(mock_calendar_agent.creds)
+        mock_schedule.assert_called_once_with()
+    
+    def test_refresh_failure_retries(self, mock_calendar_agent):
+        """Test failed refresh is retried after TOKEN_REFRESH_RETRY"""
+        from agent.calendar_agent import TOKEN_REFRESH_RETRY
+        
+        mock_calendar_agent.creds.refresh.side_effect = Exception("Network error")
+        
+        with patch.object(mock_calendar_agent, '_schedule_refresh') as mock_schedule:
+            mock_calendar_agent._refresh_token()
+        
+        mock_schedule.assert_called_once_with(delay=TOKEN_REFRESH_RETRY)
+    
+    def test_close_cancels_timer(self, mock_calendar_agent):
+        """Test close() stops the background refresh"""
+        from agent.calendar_agent import CalendarAgent
+        
+        mock_calendar_agent._schedule_refresh(delay=3600)
+        timer = CalendarAgent._refresh_timers[mock_calendar_agent._cache_key]
+        
+        mock_calendar_agent.close()
+        
+        assert timer.finished.is_set()
+        assert mock_calendar_agent._cache_key not in CalendarAgent._refresh_timers
+    
+    def test_close_keeps_timer_for_other_instances(self, mock_calendar_agent):
+        """Test the shared timer stops only when the last instance closes"""
+        from agent.calendar_agent import CalendarAgent
+        
+        other = CalendarAgent(
+            credentials_path=mock_calendar_agent.credentials_path,
+            token_path=mock_calendar_agent.token_path
+        )
+        mock_calendar_agent._schedule_refresh(delay=3600)
+        timer = CalendarAgent._refresh_timers[mock_calendar_agent._cache_key]
+        
+        mock_calendar_agent.close()
+        mock_calendar_agent.close()
+        assert not timer.finished.is_set()
+        
+        other.close()
+        assert timer.finished.is_set()
+    
+    @pytest.mark.parametrize("refresh_error", [None, Exception("Network error")])
+    def test_close_during_refresh_stops_rescheduling(self, mock_calendar_agent, refresh_error):
+        """Test a refresh that finishes (or fails) after close() arms no new timer"""
+        from datetime import datetime, timedelta, timezone
+        from agent.calendar_agent import CalendarAgent
+        
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        mock_calendar_agent.creds.expiry = now + timedelta(hours=1)
+        
+        def close_mid_refresh(request):
+            mock_calendar_agent.close()
+            if refresh_error:
+                raise refresh_error
+        
+        mock_calendar_agent.creds.refresh.side_effect = close_mid_refresh
+        
+        with patch.object(mock_calendar_agent, '_save_token'), \
+                patch('agent.calendar_agent.threading.Timer') as mock_timer:
+            mock_calendar_agent._refresh_token()
+        
+        mock_timer.return_value.start.assert_not_called()
+        assert mock_calendar_agent._cache_key not in CalendarAgent._refresh_timers
+    
+    def test_refresh_runs_outside_cache_lock(self, mock_calendar_agent):
+        """Test the network refresh does not block other instances on the cache lock"""
+        from agent.calendar_agent import CalendarAgent
+        
+        lock_held = []
+        mock_calendar_agent.creds.refresh.side_effect = (
+            lambda request: lock_held.append(CalendarAgent._cache_lock.locked())
+        )
+        
+        with patch.object(mock_calendar_agent, '_save_token'), \
+                patch.object(mock_calendar_agent, '_schedule_refresh'):
+            mock_calendar_agent._refresh_token()
+        
+        assert lock_held == [False]
+
+
+class TestCalendarAgentSaveToken:
+    """Test token.json persistence"""
+    
+    def test_save_token_writes_atomically(self, mock_calendar_agent, tmp_path):
+        """Test token is written via temp file and renamed into place"""
+        token_file = tmp_path / 'creds' / 'token.json'
+        mock_calendar_agent.token_path = str(token_file)
+        creds = MagicMock()
+        creds.to_json.return_value = '{"token": "abc"}'
+        
+        assert mock_calendar_agent._save_token(creds) is True
+        assert token_file.read_text() == '{"token": "abc"}'
+        assert not (tmp_path / 'creds' / 'token.json.tmp').exists()
+    
+    def test_save_token_skips_unchanged(self, mock_calendar_agent, tmp_path):
+        """Test no write happens when token content is identical"""
+        token_file = tmp_path / 'token.json'
+        token_file.write_text('{"token": "abc"}')
+        mock_calendar_agent.token_path = str(token_file)
+        creds = MagicMock()
+        creds.to_json.return_value = '{"token": "abc"}'
+        
+        with patch('os.replace') as mock_replace:
+            assert mock_calendar_agent._save_token(creds) is False
+        
+        mock_replace.assert_not_called()
+
+
+def _run_batch_callbacks(mock_service, outcomes, log=None):
+    """
+    Make new_batch_http_request() invoke its callback with outcomes[request_id]
+    
+    Like BatchHttpRequest, add() rejects a repeated request_id. Calls are
+    appended to log as ('add', request_id) / ('execute', None) if given.
+    """
+    log = [] if log is None else log
+    
+    def new_batch(callback):
+        batch = MagicMock()
+        added = []
+        
+        def add(request, request_id):
+            if request_id in added:
+                raise KeyError('A request with this ID already exists: %s' % request_id)
+            added.append(request_id)
+            log.append(('add', request_id))
+        
+        def execute(http=None):
+            log.append(('execute', None))
+            for request_id in added:
+                response, exception = outcomes[request_id]
+                callback(request_id, response, exception)
+        
+        batch.add.side_effect = add
+        batch.execute.side_effect = execute
+        return batch
+    
+    mock_service.new_batch_http_request.side_effect = new_batch
+
+
+class TestCalendarAgentBatch:
+    """Test batched DELETE/UPDATE operations"""
+    
+    def test_delete_events_single_batch(self, mock_calendar_agent):
+        """Test deleting several events sends one batch call"""
+        service = mock_calendar_agent.service
+        _run_batch_callbacks(service, {'e1': ({}, None), 'e2': ({}, None)})
+        
+        result = mock_calendar_agent.delete_events(['e1', 'e2'])
+        
+        assert result['success'] == True
+        assert result['deleted'] == ['e1', 'e2']
+        assert service.new_batch_http_request.call_count == 1
+        assert 'Deleted 2 event(s)' in result['message']
+    
+    def test_delete_events_partial_failure(self, mock_calendar_agent):
+        """Test per-event errors are reported without failing the batch"""
+        not_found = HttpError(resp=MagicMock(status=404), content=b'Not Found')
+        _run_batch_callbacks(mock_calendar_agent.service, {
+            'e1': ({}, None),
+            'missing': (None, not_found)
+        })
+        
+        result = mock_calendar_agent.delete_events(['e1', 'missing'])
+        
+        assert result['success'] == False
+        assert result['deleted'] == ['e1']
+        assert 'missing' in result['failed']
+        assert 'not found' in result['message']
+    
+    def test_delete_events_splits_large_batches(self, mock_calendar_agent):
+        """Test more than BATCH_SIZE ids are split across batch calls"""
+        from agent.calendar_agent import BATCH_SIZE
+        
+        ids = [f"e{i}" for i in range(BATCH_SIZE + 1)]
+        _run_batch_callbacks(mock_calendar_agent.service, {i: ({}, None) for i in ids})
+        
+        result = mock_calendar_agent.delete_events(ids)
+        
+        assert len(result['deleted']) == BATCH_SIZE + 1
+        assert mock_calendar_agent.service.new_batch_http_request.call_count == 2
+    
+    def test_delete_events_deduplicates_ids(self, mock_calendar_agent):
+        """Test a repeated event ID is deleted once instead of failing the batch"""
+        service = mock_calendar_agent.service
+        _run_batch_callbacks(service, {'e1': ({}, None), 'e2': ({}, None)})
+        
+        result = mock_calendar_agent.delete_events(['e1', 'e2', 'e1'])
+        
+        assert result['success'] == True
+        assert result['deleted'] == ['e1', 'e2']
+    
+    def test_batches_built_before_any_is_sent(self, mock_calendar_agent):
+        """Test every chunk is assembled before the first batch call"""
+        from agent.calendar_agent import BATCH_SIZE
+        
+        ids = [f"e{i}" for i in range(BATCH_SIZE + 1)]
+        log = []
+        _run_batch_callbacks(mock_calendar_agent.service, {i: ({}, None) for i in ids}, log)
+        
+        mock_calendar_agent.delete_events(ids)
+        
+        assert [op for op, _ in log] == ['add'] * (BATCH_SIZE + 1) + ['execute'] * 2
+    
+    def test_update_events_merges_duplicates(self, mock_calendar_agent):
+        """Test updates of the same event become one patch, later fields winning"""
+        service = mock_calendar_agent.service
+        _run_batch_callbacks(service, {'e1': ({'summary': 'B'}, None)})
+        
+        result = mock_calendar_agent.update_events([
+            {'event_id': 'e1', 'title': 'A'},
+            {'event_id': 'e1', 'title': 'B', 'description': 'note'},
+        ])
+        
+        assert result['success'] == True
+        assert result['updated'] == ['e1']
+        service.events().patch.assert_called_once()
+        assert service.events().patch.call_args.kwargs['body'] == {'summary': 'B', 'description': 'note'}
+    
+    def test_update_events_uses_patch(self, mock_calendar_agent):
+        """Test batch update sends partial bodies via events().patch"""
+        service = mock_calendar_agent.service
+        _run_batch_callbacks(service, {
+            'e1': ({'summary': 'Renamed'}, None),
+            'e2': ({'summary': 'Moved'}, None)
+        })
+        
+        result = mock_calendar_agent.update_events([
+            {'event_id': 'e1', 'title': 'Renamed'},
+            {'event_id': 'e2', 'date': '2025-11-01', 'time': '15:00', 'duration': 30}
+        ])
+        
+        assert result['success'] == True
+        assert result['updated'] == ['e1', 'e2']
+        bodies = [c.kwargs['body'] for c in service.events().patch.call_args_list]
+        assert bodies[0] == {'summary': 'Renamed'}
+        assert bodies[1]['start']['dateTime'] == '2025-11-01T15:00:00'
+        assert bodies[1]['end']['dateTime'] == '2025-11-01T15:30:00'
+        service.events().get.assert_not_called()
+
+
+class TestDateParsing:
+    """Test memoized date parsing helpers"""
+    
+    def test_parse_datetime_is_memoized(self):
+        """Test repeated parses of the same date/time hit the cache"""
+        from datetime import datetime
+        from agent.calendar_agent import _parse_datetime
+        
+        _parse_datetime.cache_clear()
+        first = _parse_datetime('2025-10-30', '14:00')
+        second = _parse_datetime('2025-10-30', '14:00')
+        
+        assert first == datetime(2025, 10, 30, 14, 0)
+        assert second is first
+        assert _parse_datetime.cache_info().hits == 1
+    
+    def test_parse_date_invalid_raises(self):
+        """Test invalid dates still raise ValueError"""
+        from agent.calendar_agent import _parse_date
+        
+        with pytest.raises(ValueError):
+            _parse_date('30-10-2025')
+    
+    def test_format_start_matches_parsed_output(self):
+        """Test slicing gives the same text as parse + strftime"""
+        from datetime import datetime
+        from agent.calendar_agent import _format_start
+        
+        for start in ('2025-10-30T14:00:00+07:00', '2025-10-30T07:05:00Z', '2025-10-30'):
+            expected = datetime.fromisoformat(start.replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M')
+            assert _format_start(start) == expected
+
+
+class TestCalendarAgentAsync:
+    """Test async variants and per-thread transports"""
+    
+    async def test_create_event_async(self, mock_calendar_agent, sample_event_data):
+        """Test async create returns the same result as the sync call"""
+        result = await mock_calendar_agent.create_event_async(**sample_event_data)
+        
+        assert result['success'] == True
+        assert result['event_id'] == 'test_event_123'
+    
+    async def test_read_events_async_concurrent(self, mock_calendar_agent):
+        """Test several async reads can run concurrently"""
+        import asyncio
+        
+        results = await asyncio.gather(
+            mock_calendar_agent.read_events_async(days=7),
+            mock_calendar_agent.read_events_async(date='2025-10-30')
+        )
+        
+        assert all(r['success'] for r in results)
+    
+    def test_each_thread_gets_own_transport(self, mock_calendar_agent):
+        """Test httplib2 transports are not shared between threads"""
+        import threading
+        
+        transports = []
+        worker = threading.Thread(target=lambda: transports.append(mock_calendar_agent._thread_http()))
+        worker.start()
+        worker.join()
+        
+        main_http = mock_calendar_agent._thread_http()
+        assert main_http is mock_calendar_agent._thread_http()
+        assert transports[0] is not main_http
@@ -2,40 +2,59 @@
 Unit tests for calendar_tools wrapper functions
 """
 import pytest
-from unittest.mock import patch, MagicMock
+from collections.abc import Mapping
+from unittest.mock import MagicMock
+
+from agent.tools.calendar_tools import (
+    CALENDAR_TOOLS,
+    add_calendar_event,
+    delete_calendar_event,
+    delete_calendar_events,
+    list_calendar_events,
+    update_calendar_event,
+    update_calendar_events,
+)
+
+# Shared failure side effects for the error-path tests
+_CAL_ERR = Exception("Calendar API Error")
+_NET_ERR = Exception("Network error")
+_UPDATE_ERR = Exception("Update failed")
+_DELETE_ERR = Exception("Delete failed")
+
+TOOL_NAMES = (
+    'add_calendar_event',
+    'list_calendar_events',
+    'update_calendar_event',
+    'delete_calendar_event',
+    'update_calendar_events',
+    'delete_calendar_events',
+)
+REQUIRED_FIELDS = ('name', 'description', 'parameters')
 
 
 class TestAddCalendarEvent:
     """Test add_calendar_event function"""
     
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_add_event_success(self, mock_get_agent, sample_event_data):
+    def test_add_event_success(self, mock_tools_agent, sample_event_data):
         """Test adding event successfully"""
-        from agent.tools.calendar_tools import add_calendar_event
         
         # Mock agent response
-        mock_agent = MagicMock()
-        mock_agent.create_event.return_value = {
+        mock_tools_agent.create_event.return_value = {
             'success': True,
             'event_id': 'test123',
             'message': 'Event created'
         }
-        mock_get_agent.return_value = mock_agent
         
         result = add_calendar_event(**sample_event_data)
         
         assert result['success'] == True
         assert 'event_id' in result
-        mock_agent.create_event.assert_called_once()
+        mock_tools_agent.create_event.assert_called_once()
     
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_add_event_with_optional_params(self, mock_get_agent):
+    def test_add_event_with_optional_params(self, mock_tools_agent):
         """Test adding event with all optional parameters"""
-        from agent.tools.calendar_tools import add_calendar_event
         
-        mock_agent = MagicMock()
-        mock_agent.create_event.return_value = {'success': True, 'event_id': 'test123'}
-        mock_get_agent.return_value = mock_agent
+        mock_tools_agent.create_event.return_value = {'success': True, 'event_id': 'test123'}
         
         result = add_calendar_event(
             title='Meeting',
@@ -47,18 +66,14 @@ class TestAddCalendarEvent:
         
         assert result['success'] == True
         # Verify all params were passed
-        call_args = mock_agent.create_event.call_args
+        call_args = mock_tools_agent.create_event.call_args
         assert call_args.kwargs['duration'] == 90
         assert call_args.kwargs['description'] == 'Important meeting'
     
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_add_event_error_handling(self, mock_get_agent):
+    def test_add_event_error_handling(self, mock_tools_agent):
         """Test error handling when agent fails"""
-        from agent.tools.calendar_tools import add_calendar_event
         
-        mock_agent = MagicMock()
-        mock_agent.create_event.side_effect = Exception("Calendar API Error")
-        mock_get_agent.return_value = mock_agent
+        mock_tools_agent.create_event.side_effect = _CAL_ERR
         
         result = add_calendar_event(
             title='Test',
@@ -73,65 +88,30 @@ class TestAddCalendarEvent:
 class TestListCalendarEvents:
     """Test list_calendar_events function"""
     
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_list_events_default(self, mock_get_agent):
-        """Test listing events with default parameters"""
-        from agent.tools.calendar_tools import list_calendar_events
-        
-        mock_agent = MagicMock()
-        mock_agent.read_events.return_value = {
+    @pytest.mark.parametrize("kwargs,date,days", [
+        ({}, None, 7),
+        ({'date': '2025-10-30'}, '2025-10-30', 7),
+        ({'days': 14}, None, 14),
+    ])
+    def test_list_events_passes_range(self, mock_tools_agent, kwargs, date, days):
+        """Test date/days reach the agent, defaulting to the next 7 days"""
+        
+        mock_tools_agent.read_events.return_value = {
             'success': True,
             'events': [{'id': 'e1', 'title': 'Event 1'}],
             'message': 'Found 1 event'
         }
-        mock_get_agent.return_value = mock_agent
         
-        result = list_calendar_events()
+        result = list_calendar_events(**kwargs)
         
         assert result['success'] == True
         assert len(result['events']) == 1
-        # Should call with default days=7
-        mock_agent.read_events.assert_called_once_with(date=None, days=7)
-    
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_list_events_specific_date(self, mock_get_agent):
-        """Test listing events for specific date"""
-        from agent.tools.calendar_tools import list_calendar_events
-        
-        mock_agent = MagicMock()
-        mock_agent.read_events.return_value = {
-            'success': True,
-            'events': [],
-            'message': 'No events'
-        }
-        mock_get_agent.return_value = mock_agent
-        
-        result = list_calendar_events(date='2025-10-30')
-        
-        assert result['success'] == True
-        mock_agent.read_events.assert_called_once_with(date='2025-10-30', days=7)
+        mock_tools_agent.read_events.assert_called_once_with(date=date, days=days)
     
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_list_events_custom_days(self, mock_get_agent):
-        """Test listing events for custom number of days"""
-        from agent.tools.calendar_tools import list_calendar_events
-        
-        mock_agent = MagicMock()
-        mock_agent.read_events.return_value = {'success': True, 'events': []}
-        mock_get_agent.return_value = mock_agent
-        
-        result = list_calendar_events(days=14)
-        
-        mock_agent.read_events.assert_called_once_with(date=None, days=14)
-    
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_list_events_error(self, mock_get_agent):
+    def test_list_events_error(self, mock_tools_agent):
         """Test error handling when listing fails"""
-        from agent.tools.calendar_tools import list_calendar_events
         
-        mock_agent = MagicMock()
-        mock_agent.read_events.side_effect = Exception("Network error")
-        mock_get_agent.return_value = mock_agent
+        mock_tools_agent.read_events.side_effect = _NET_ERR
         
         result = list_calendar_events()
         
@@ -142,79 +122,30 @@ class TestListCalendarEvents:
 class TestUpdateCalendarEvent:
     """Test update_calendar_event function"""
     
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_update_event_title_only(self, mock_get_agent):
-        """Test updating only title"""
-        from agent.tools.calendar_tools import update_calendar_event
-        
-        mock_agent = MagicMock()
-        mock_agent.update_event.return_value = {'success': True, 'message': 'Updated'}
-        mock_get_agent.return_value = mock_agent
-        
-        result = update_calendar_event(
-            event_id='test123',
-            title='New Title'
-        )
+    @pytest.mark.parametrize("kwargs,absent", [
+        ({'title': 'New Title'}, ['date', 'time', 'duration', 'description']),
+        ({'title': 'New Title', 'date': '2025-11-01', 'time': '15:00', 'duration': 120}, ['description']),
+        ({'title': 'New Title', 'date': None, 'time': None}, ['date', 'time']),
+    ], ids=['title_only', 'multiple_fields', 'none_values_ignored'])
+    def test_update_event_passthrough(self, mock_tools_agent, kwargs, absent):
+        """Test set fields reach the agent unchanged and None fields are dropped"""
         
-        assert result['success'] == True
-        # Should only pass title
-        call_kwargs = mock_agent.update_event.call_args.kwargs
-        assert 'title' in call_kwargs
-        assert call_kwargs['title'] == 'New Title'
-    
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_update_event_multiple_fields(self, mock_get_agent):
-        """Test updating multiple fields"""
-        from agent.tools.calendar_tools import update_calendar_event
-        
-        mock_agent = MagicMock()
-        mock_agent.update_event.return_value = {'success': True}
-        mock_get_agent.return_value = mock_agent
-        
-        result = update_calendar_event(
-            event_id='test123',
-            title='New Title',
-            date='2025-11-01',
-            time='15:00',
-            duration=120
-        )
+        mock_tools_agent.update_event.return_value = {'success': True, 'message': 'Updated'}
         
-        assert result['success'] == True
-        call_kwargs = mock_agent.update_event.call_args.kwargs
-        assert call_kwargs['title'] == 'New Title'
-        assert call_kwargs['date'] == '2025-11-01'
-        assert call_kwargs['time'] == '15:00'
-        assert call_kwargs['duration'] == 120
-    
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_update_event_none_values_ignored(self, mock_get_agent):
-        """Test that None values are not passed to agent"""
-        from agent.tools.calendar_tools import update_calendar_event
-        
-        mock_agent = MagicMock()
-        mock_agent.update_event.return_value = {'success': True}
-        mock_get_agent.return_value = mock_agent
-        
-        result = update_calendar_event(
-            event_id='test123',
-            title='New Title',
-            date=None,  # Should not be passed
-            time=None   # Should not be passed
-        )
+        result = update_calendar_event(event_id='test123', **kwargs)
         
-        call_kwargs = mock_agent.update_event.call_args.kwargs
-        assert 'title' in call_kwargs
-        assert 'date' not in call_kwargs
-        assert 'time' not in call_kwargs
+        assert result['success'] == True
+        call_kwargs = mock_tools_agent.update_event.call_args.kwargs
+        for key, value in kwargs.items():
+            if value is not None:
+                assert call_kwargs[key] == value
+        for key in absent:
+            assert key not in call_kwargs
     
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_update_event_error(self, mock_get_agent):
+    def test_update_event_error(self, mock_tools_agent):
         """Test error handling during update"""
-        from agent.tools.calendar_tools import update_calendar_event
         
-        mock_agent = MagicMock()
-        mock_agent.update_event.side_effect = Exception("Update failed")
-        mock_get_agent.return_value = mock_agent
+        mock_tools_agent.update_event.side_effect = _UPDATE_ERR
         
         result = update_calendar_event(event_id='test123', title='New')
         
@@ -225,48 +156,36 @@ class TestUpdateCalendarEvent:
 class TestDeleteCalendarEvent:
     """Test delete_calendar_event function"""
     
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_delete_event_success(self, mock_get_agent):
+    def test_delete_event_success(self, mock_tools_agent):
         """Test deleting event successfully"""
-        from agent.tools.calendar_tools import delete_calendar_event
         
-        mock_agent = MagicMock()
-        mock_agent.delete_event.return_value = {
+        mock_tools_agent.delete_event.return_value = {
             'success': True,
             'message': 'Event deleted'
         }
-        mock_get_agent.return_value = mock_agent
         
         result = delete_calendar_event(event_id='test123')
         
         assert result['success'] == True
-        mock_agent.delete_event.assert_called_once_with(event_id='test123')
+        mock_tools_agent.delete_event.assert_called_once_with(event_id='test123')
     
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_delete_event_not_found(self, mock_get_agent):
+    def test_delete_event_not_found(self, mock_tools_agent):
         """Test deleting non-existent event"""
-        from agent.tools.calendar_tools import delete_calendar_event
         
-        mock_agent = MagicMock()
-        mock_agent.delete_event.return_value = {
+        mock_tools_agent.delete_event.return_value = {
             'success': False,
             'message': 'Event not found'
         }
-        mock_get_agent.return_value = mock_agent
         
         result = delete_calendar_event(event_id='nonexistent')
         
         assert result['success'] == False
         assert 'not found' in result['message'].lower()
     
-    @patch('agent.tools.calendar_tools.get_calendar_agent')
-    def test_delete_event_error(self, mock_get_agent):
+    def test_delete_event_error(self, mock_tools_agent):
         """Test error handling during delete"""
-        from agent.tools.calendar_tools import delete_calendar_event
         
-        mock_agent = MagicMock()
-        mock_agent.delete_event.side_effect = Exception("Delete failed")
-        mock_get_agent.return_value = mock_agent
+        mock_tools_agent.delete_event.side_effect = _DELETE_ERR
         
         result = delete_calendar_event(event_id='test123')
         
@@ -274,39 +193,74 @@ class TestDeleteCalendarEvent:
         assert 'Error' in result['message']
 
 
+class TestBatchCalendarTools:
+    """Test update_calendar_events / delete_calendar_events functions"""
+    
+    def test_update_events_drops_missing_fields(self, mock_tools_agent):
+        """Test each update only forwards the fields that were given"""
+        
+        mock_tools_agent.update_events.return_value = {'success': True, 'updated': ['a', 'b']}
+        
+        result = update_calendar_events(updates=[
+            {'event_id': 'a', 'title': 'X', 'date': None},
+            {'event_id': 'b', 'time': '10:00'},
+        ])
+        
+        assert result['success'] == True
+        mock_tools_agent.update_events.assert_called_once_with([
+            {'event_id': 'a', 'title': 'X'},
+            {'event_id': 'b', 'time': '10:00'},
+        ])
+    
+    def test_delete_events_passthrough(self, mock_tools_agent):
+        """Test event IDs are forwarded as one batch"""
+        
+        mock_tools_agent.delete_events.return_value = {'success': True, 'deleted': ['a', 'b']}
+        
+        result = delete_calendar_events(event_ids=('a', 'b'))
+        
+        assert result['success'] == True
+        mock_tools_agent.delete_events.assert_called_once_with(['a', 'b'])
+    
+    def test_delete_events_error(self, mock_tools_agent):
+        """Test error handling during batch delete"""
+        
+        mock_tools_agent.delete_events.side_effect = _DELETE_ERR
+        
+        result = delete_calendar_events(event_ids=['a'])
+        
+        assert result['success'] == False
+        assert 'Error' in result['message']
+
+
 class TestCalendarToolsDeclarations:
     """Test CALENDAR_TOOLS declarations"""
     
-    def test_tools_structure(self):
+    def test_tools_structure(self, calendar_tool_decls):
         """Test that CALENDAR_TOOLS has correct structure"""
-        from agent.tools.calendar_tools import CALENDAR_TOOLS
         
-        assert isinstance(CALENDAR_TOOLS, list)
-        assert len(CALENDAR_TOOLS) == 4  # 4 CRUD operations
-        
-        for tool in CALENDAR_TOOLS:
-            assert 'name' in tool
-            assert 'description' in tool
-            assert 'parameters' in tool
+        assert isinstance(CALENDAR_TOOLS, tuple)
+        assert len(CALENDAR_TOOLS) == 6  # 4 CRUD operations + batch update/delete
+        assert sorted(calendar_tool_decls) == sorted(TOOL_NAMES)
     
-    def test_required_tools_exist(self):
-        """Test all 4 CRUD tools are declared"""
-        from agent.tools.calendar_tools import CALENDAR_TOOLS
-        
-        tool_names = [tool['name'] for tool in CALENDAR_TOOLS]
+    @pytest.mark.parametrize("name,field", [(n, f) for n in TOOL_NAMES for f in REQUIRED_FIELDS])
+    def test_required_fields(self, calendar_tool_decls, name, field):
+        """Test every tool is declared with name, description and parameters"""
         
-        assert 'add_calendar_event' in tool_names
-        assert 'list_calendar_events' in tool_names
-        assert 'update_calendar_event' in tool_names
-        assert 'delete_calendar_event' in tool_names
+        assert field in calendar_tool_decls[name]
     
-    def test_tool_parameters_structure(self):
+    @pytest.mark.parametrize("name", TOOL_NAMES)
+    def test_tool_parameters_structure(self, calendar_tool_decls, name):
         """Test each tool has proper parameter structure"""
-        from agent.tools.calendar_tools import CALENDAR_TOOLS
-        
-        for tool in CALENDAR_TOOLS:
-            params = tool['parameters']
-            assert 'type' in params
-            assert params['type'] == 'object'
-            assert 'properties' in params
-            assert isinstance(params['properties'], dict)
\ No newline at end of file
+        
+        params = calendar_tool_decls[name]['parameters']
+        assert params['type'] == 'object'
+        assert isinstance(params['properties'], Mapping)
+    
+    def test_tools_are_read_only(self):
+        """Test the shared declarations can't be mutated"""
+        
+        with pytest.raises(TypeError):
+            CALENDAR_TOOLS[0]['name'] = 'changed'
+        with pytest.raises(AttributeError):
+            CALENDAR_TOOLS[0]['parameters']['required'].append('description')
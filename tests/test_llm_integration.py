@@ -2,20 +2,68 @@
 Integration tests for LLM Agent with Function Calling
 Tests the full flow: User message -> LLM -> Function Call -> Response
 """
-import pytest
-from unittest.mock import patch, MagicMock, Mock
+import asyncio
 import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+import google.generativeai as genai
+from unittest.mock import patch, MagicMock, Mock, AsyncMock
+
+from agent.llm_agent import (
+    LLMAgent,
+    NO_TOOLS_CONFIG,
+    SPECULATION_MIN_SAMPLES,
+    _build_calendar_tools_proto,
+    _call_key,
+    _can_run_parallel,
+    _configure,
+    _render_system_prompt,
+)
+from agent.tools import calendar_tools
+from agent.tools.calendar_tools import CALENDAR_TOOLS
+
+# Shared failure side effect for the error-path tests
+_NET_ERR = Exception("Network error")
+
+# Canned two-round dialogs: function call, then the model's final reply
+ADD_EVENT_FC_RESPONSES = (
+    SimpleNamespace(parts=[SimpleNamespace(
+        function_call=SimpleNamespace(
+            name="add_calendar_event",
+            args={'title': 'Meeting', 'date': '2025-10-30', 'time': '14:00', 'duration': 60},
+        ),
+        text=None,
+    )]),
+    SimpleNamespace(
+        parts=[SimpleNamespace(text="✅ Event created successfully!", function_call=None)],
+        text="✅ Event created successfully!",
+    ),
+)
+LIST_EVENTS_FC_RESPONSES = (
+    SimpleNamespace(parts=[SimpleNamespace(
+        function_call=SimpleNamespace(name="list_calendar_events", args={'days': 7}),
+        text=None,
+    )]),
+    SimpleNamespace(
+        parts=[SimpleNamespace(text="Kamu punya 2 events minggu ini", function_call=None)],
+        text="Kamu punya 2 events minggu ini",
+    ),
+)
 
 
 class TestLLMAgentInitialization:
     """Test LLM Agent initialization"""
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    def test_init_without_calendar(self, mock_model_class, mock_configure):
+    def test_init_without_calendar(self, mock_configure):
         """Test initialization without calendar tools"""
-        from agent.llm_agent import LLMAgent
         
+        _configure.cache_clear()
         agent = LLMAgent(
             api_key="test_api_key",
             model_name="gemini-2.0-flash-exp",
@@ -28,29 +76,31 @@ class TestLLMAgentInitialization:
         assert agent.tools is None
         mock_configure.assert_called_once_with(api_key="test_api_key")
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    @patch('agent.llm_agent.LLMAgent._setup_calendar_tools')
-    def test_init_with_calendar(self, mock_setup_tools, mock_model_class, mock_configure):
+    def test_init_with_calendar(self):
         """Test initialization with calendar tools enabled"""
-        from agent.llm_agent import LLMAgent
         
-        mock_setup_tools.return_value = [MagicMock()]
-        
-        agent = LLMAgent(
-            api_key="test_api_key",
-            enable_calendar=True
-        )
+        with patch.object(LLMAgent, '_setup_calendar_tools', return_value=[MagicMock()]) as mock_setup_tools:
+            agent = LLMAgent(
+                api_key="test_api_key",
+                enable_calendar=True
+            )
         
         assert agent.enable_calendar == True
         assert agent.tools is not None
         mock_setup_tools.assert_called_once()
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    def test_system_prompt_contains_calendar_info(self, mock_model_class, mock_configure):
+    def test_configure_once_per_api_key(self, mock_configure):
+        """Test repeated constructions with the same key configure the SDK once"""
+        
+        _configure.cache_clear()
+        LLMAgent(api_key="test_key", enable_calendar=False)
+        LLMAgent(api_key="test_key", enable_calendar=False)
+        LLMAgent(api_key="other_key", enable_calendar=False)
+        
+        assert mock_configure.call_count == 2
+    
+    def test_system_prompt_contains_calendar_info(self):
         """Test system prompt includes calendar info when enabled"""
-        from agent.llm_agent import LLMAgent
         
         with patch('agent.llm_agent.LLMAgent._setup_calendar_tools'):
             agent = LLMAgent(api_key="test_key", enable_calendar=True)
@@ -58,31 +108,100 @@ class TestLLMAgentInitialization:
             assert "calendar" in agent.system_prompt.lower()
             assert "add_calendar_event" in agent.system_prompt
             assert "list_calendar_events" in agent.system_prompt
+    
+    def test_calendar_tools_built_once(self):
+        """Test tool protos are built once and shared between agents"""
+        
+        _build_calendar_tools_proto.cache_clear()
+        first = LLMAgent(api_key="test_key", enable_calendar=True)
+        second = LLMAgent(api_key="test_key", enable_calendar=True)
+        
+        assert second.tools is first.tools
+        assert _build_calendar_tools_proto.cache_info().misses == 1
+        names = [decl.name for decl in first.tools[0].function_declarations]
+        assert names == ['add_calendar_event', 'list_calendar_events',
+                         'update_calendar_event', 'delete_calendar_event',
+                         'update_calendar_events', 'delete_calendar_events']
+        updates = first.tools[0].function_declarations[4].parameters.properties['updates']
+        assert updates.items.properties['event_id'].type_ == genai.protos.Type.STRING
+        assert list(updates.items.required) == ['event_id']
+    
+    def test_system_prompt_render_is_memoized(self):
+        """Test dates are filled in once per day and the string is shared"""
+        
+        _render_system_prompt.cache_clear()
+        first = _render_system_prompt(True, date(2025, 12, 31))
+        second = _render_system_prompt(True, date(2025, 12, 31))
+        
+        assert second is first
+        assert '"hari ini" = 2025-12-31' in first
+        assert '"besok" = 2026-01-01' in first
+        assert '"lusa" = 2026-01-02' in first
+        assert "{today}" not in first
+        assert "add_calendar_event" not in _render_system_prompt(False, date(2025, 12, 31))
+    
+    def test_prompt_refreshed_after_midnight(self, mock_model_class, mock_chat):
+        """Test a new day re-renders the prompt and moves live sessions to the new model"""
+        
+        mock_chat.send_message.return_value = SimpleNamespace(
+            parts=[SimpleNamespace(text="Hai", function_call=None)]
+        )
+        
+        with patch('agent.llm_agent.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime(2025, 10, 30, 23, 59)
+            agent = LLMAgent(api_key="test_key", enable_calendar=True)
+            agent.process("user1", "halo")
+            assert mock_model_class.call_count == 1
+            assert mock_model_class.return_value.start_chat.call_count == 1
+            
+            mock_datetime.now.return_value = datetime(2025, 10, 31, 0, 1)
+            agent.process("user1", "halo lagi")
+        
+        assert '"hari ini" = 2025-10-31' in agent.system_prompt
+        assert mock_model_class.call_count == 2
+        assert mock_model_class.call_args.kwargs['system_instruction'] == agent.system_prompt
+        # The existing session keeps its history on the new model
+        start_chat = mock_model_class.return_value.start_chat
+        assert start_chat.call_count == 2
+        assert start_chat.call_args.kwargs['history'] is mock_chat.history
+    
+    @patch('google.generativeai.caching.CachedContent.create')
+    @patch('agent.llm_agent.threading.Timer')
+    def test_init_with_context_cache(self, mock_timer, mock_create, mock_model_class):
+        """Test system prompt + tools are served from a CachedContent"""
+        
+        agent = LLMAgent(api_key="test_key", enable_calendar=False, use_context_cache=True)
+        
+        assert mock_create.call_args.kwargs['system_instruction'] == agent.system_prompt
+        mock_model_class.from_cached_content.assert_called_once_with(mock_create.return_value)
+        assert agent.model is mock_model_class.from_cached_content.return_value
+        mock_timer.return_value.start.assert_called_once()
+        
+        agent.close()
+        mock_timer.return_value.cancel.assert_called_once()
+    
+    @patch('google.generativeai.caching.CachedContent.create')
+    def test_context_cache_falls_back(self, mock_create, mock_model_class):
+        """Test a plain model is used when context caching is unavailable"""
+        
+        mock_create.side_effect = Exception("Cached content is too small")
+        
+        agent = LLMAgent(api_key="test_key", enable_calendar=False, use_context_cache=True)
+        
+        assert agent.model is mock_model_class.return_value
+        assert agent._cached_content is None
+        mock_model_class.from_cached_content.assert_not_called()
 
 
 class TestLLMAgentSimpleChat:
     """Test simple chat without function calling"""
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    def test_simple_text_response(self, mock_model_class, mock_configure):
+    def test_simple_text_response(self, mock_chat):
         """Test simple text response without function calling"""
-        from agent.llm_agent import LLMAgent
-        
-        # Setup mock
-        mock_model = MagicMock()
-        mock_model_class.return_value = mock_model
-        
-        mock_chat = MagicMock()
-        mock_model.start_chat.return_value = mock_chat
         
         # Mock response with only text
-        mock_response = MagicMock()
-        mock_part = MagicMock()
-        mock_part.text = "Hello! How can I help you?"
-        mock_part.function_call = None
-        mock_response.parts = [mock_part]
-        mock_response.text = "Hello! How can I help you?"
+        mock_part = SimpleNamespace(text="Hello! How can I help you?", function_call=None)
+        mock_response = SimpleNamespace(parts=[mock_part], text="Hello! How can I help you?")
         mock_chat.send_message.return_value = mock_response
         
         # Test
@@ -92,22 +211,11 @@ class TestLLMAgentSimpleChat:
         assert response == "Hello! How can I help you?"
         mock_chat.send_message.assert_called_once_with("Hello")
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    def test_empty_response_fallback(self, mock_model_class, mock_configure):
+    def test_empty_response_fallback(self, mock_chat):
         """Test fallback when response is empty"""
-        from agent.llm_agent import LLMAgent
-        
-        mock_model = MagicMock()
-        mock_model_class.return_value = mock_model
-        
-        mock_chat = MagicMock()
-        mock_model.start_chat.return_value = mock_chat
         
         # Mock empty response
-        mock_response = MagicMock()
-        mock_response.parts = []
-        mock_response.text = None
+        mock_response = SimpleNamespace(parts=[], text=None)
         mock_chat.send_message.return_value = mock_response
         
         agent = LLMAgent(api_key="test_key", enable_calendar=False)
@@ -119,45 +227,26 @@ class TestLLMAgentSimpleChat:
 class TestLLMAgentFunctionCalling:
     """Test LLM function calling integration"""
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
+    def test_extract_function_calls_skips_empty_parts(self, llm_agent_nocal):
+        """Test only parts with a named function_call are extracted"""
+        
+        response = SimpleNamespace(parts=[
+            SimpleNamespace(text="Sebentar ya", function_call=None),
+            SimpleNamespace(text="", function_call=SimpleNamespace(name="", args={})),
+            SimpleNamespace(text="", function_call=SimpleNamespace(name="list_calendar_events", args={"days": 3})),
+        ])
+        
+        assert llm_agent_nocal._extract_function_calls(response) == [
+            {'name': 'list_calendar_events', 'args': {'days': 3}}
+        ]
+        assert llm_agent_nocal._extract_function_calls(SimpleNamespace(parts=[])) == []
+    
+    @pytest.mark.slow
     @patch('agent.tools.calendar_tools.add_calendar_event')
-    def test_add_event_function_call(self, mock_add_event, mock_model_class, mock_configure):
+    def test_add_event_function_call(self, mock_add_event, mock_chat):
         """Test adding calendar event via function call"""
-        from agent.llm_agent import LLMAgent
-        
-        # Setup model mock
-        mock_model = MagicMock()
-        mock_model_class.return_value = mock_model
-        
-        mock_chat = MagicMock()
-        mock_model.start_chat.return_value = mock_chat
-        
-        # Mock first response with function call
-        mock_response1 = MagicMock()
-        mock_fc = MagicMock()
-        mock_fc.name = "add_calendar_event"
-        mock_fc.args = {
-            'title': 'Meeting',
-            'date': '2025-10-30',
-            'time': '14:00',
-            'duration': 60
-        }
-        
-        mock_part1 = MagicMock()
-        mock_part1.function_call = mock_fc
-        mock_part1.text = None
-        mock_response1.parts = [mock_part1]
         
-        # Mock second response after function execution
-        mock_response2 = MagicMock()
-        mock_part2 = MagicMock()
-        mock_part2.text = "✅ Event created successfully!"
-        mock_part2.function_call = None
-        mock_response2.parts = [mock_part2]
-        mock_response2.text = "✅ Event created successfully!"
-        
-        mock_chat.send_message.side_effect = [mock_response1, mock_response2]
+        mock_chat.send_message.side_effect = list(ADD_EVENT_FC_RESPONSES)
         
         # Mock calendar tool response
         mock_add_event.return_value = {
@@ -174,39 +263,12 @@ class TestLLMAgentFunctionCalling:
         assert "✅" in response
         mock_add_event.assert_called_once()
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
+    @pytest.mark.slow
     @patch('agent.tools.calendar_tools.list_calendar_events')
-    def test_list_events_function_call(self, mock_list_events, mock_model_class, mock_configure):
+    def test_list_events_function_call(self, mock_list_events, mock_chat):
         """Test listing calendar events via function call"""
-        from agent.llm_agent import LLMAgent
-        
-        mock_model = MagicMock()
-        mock_model_class.return_value = mock_model
-        
-        mock_chat = MagicMock()
-        mock_model.start_chat.return_value = mock_chat
-        
-        # Mock function call response
-        mock_response1 = MagicMock()
-        mock_fc = MagicMock()
-        mock_fc.name = "list_calendar_events"
-        mock_fc.args = {'days': 7}
-        
-        mock_part1 = MagicMock()
-        mock_part1.function_call = mock_fc
-        mock_part1.text = None
-        mock_response1.parts = [mock_part1]
         
-        # Mock final response
-        mock_response2 = MagicMock()
-        mock_part2 = MagicMock()
-        mock_part2.text = "Kamu punya 2 events minggu ini"
-        mock_part2.function_call = None
-        mock_response2.parts = [mock_part2]
-        mock_response2.text = "Kamu punya 2 events minggu ini"
-        
-        mock_chat.send_message.side_effect = [mock_response1, mock_response2]
+        mock_chat.send_message.side_effect = list(LIST_EVENTS_FC_RESPONSES)
         
         # Mock calendar response
         mock_list_events.return_value = {
@@ -226,40 +288,65 @@ class TestLLMAgentFunctionCalling:
         mock_list_events.assert_called_once()
 
 
+    @patch('agent.tools.calendar_tools.delete_calendar_event')
+    def test_empty_final_reply_uses_tool_message(self, mock_delete, mock_chat):
+        """Test the tool's own message is returned when the model adds no text"""
+        
+        mock_delete.return_value = {'success': True, 'message': '🗑️ **Event deleted!**'}
+        
+        mock_fc = SimpleNamespace(name="delete_calendar_event", args={"event_id": "abc"})
+        mock_fc_part = SimpleNamespace(function_call=mock_fc)
+        mock_fc_response = SimpleNamespace(parts=[mock_fc_part])
+        
+        mock_empty = SimpleNamespace(parts=[], text=None)
+        mock_chat.send_message.side_effect = [mock_fc_response, mock_empty]
+        
+        agent = LLMAgent(api_key="test_key", enable_calendar=False)
+        response = agent.process("user1", "hapus event abc")
+        
+        assert response == '🗑️ **Event deleted!**'
+
+
 class TestLLMAgentErrorHandling:
     """Test error handling in function calls"""
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    @patch('agent.tools.calendar_tools.add_calendar_event')
-    def test_function_execution_error(self, mock_add_event, mock_model_class, mock_configure):
-        """Test handling of function execution errors"""
-        from agent.llm_agent import LLMAgent
+    def test_unknown_function(self, llm_agent_nocal):
+        """Test unknown tool names return an error result"""
         
-        mock_model = MagicMock()
-        mock_model_class.return_value = mock_model
+        result = llm_agent_nocal._execute_function({'name': 'send_email', 'args': {}})
         
-        mock_chat = MagicMock()
-        mock_model.start_chat.return_value = mock_chat
+        assert result['success'] == False
+        assert "Unknown function: send_email" in result['error']
+    
+    def test_args_not_serialized_when_info_disabled(self, llm_agent_nocal):
+        """Test tool args are only JSON-encoded when INFO logs are emitted"""
+        
+        llm_logger = logging.getLogger('agent.llm_agent')
+        previous = llm_logger.level
+        llm_logger.setLevel(logging.WARNING)
+        try:
+            with patch('agent.llm_agent.json.dumps') as mock_dumps:
+                llm_agent_nocal._execute_function({'name': 'send_email', 'args': {'to': 'x'}})
+            mock_dumps.assert_not_called()
+        finally:
+            llm_logger.setLevel(previous)
+    
+    @patch('agent.tools.calendar_tools.add_calendar_event')
+    def test_function_execution_error(self, mock_add_event, mock_chat):
+        """Test handling of function execution errors"""
         
         # Mock function call
-        mock_response1 = MagicMock()
-        mock_fc = MagicMock()
-        mock_fc.name = "add_calendar_event"
-        mock_fc.args = {'title': 'Test', 'date': '2025-10-30', 'time': '14:00'}
+        mock_fc = SimpleNamespace(
+            name="add_calendar_event",
+            args={'title': 'Test', 'date': '2025-10-30', 'time': '14:00'},
+        )
         
-        mock_part1 = MagicMock()
-        mock_part1.function_call = mock_fc
-        mock_part1.text = None
-        mock_response1.parts = [mock_part1]
+        mock_part1 = SimpleNamespace(function_call=mock_fc, text=None)
+        mock_response1 = SimpleNamespace(parts=[mock_part1])
         
         # Mock error response
-        mock_response2 = MagicMock()
-        mock_part2 = MagicMock()
-        mock_part2.text = "Maaf, terjadi error"
-        mock_part2.function_call = None
-        mock_response2.parts = [mock_part2]
-        mock_response2.text = "Maaf, terjadi error"
+        mock_part2 = SimpleNamespace(text="Maaf, terjadi error", function_call=None)
+        mock_response2 = SimpleNamespace(parts=[mock_part2], text="Maaf, terjadi error")
         
         mock_chat.send_message.side_effect = [mock_response1, mock_response2]
         
@@ -275,20 +362,11 @@ class TestLLMAgentErrorHandling:
         
         assert "error" in response.lower() or "maaf" in response.lower()
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    def test_process_exception_handling(self, mock_model_class, mock_configure):
+    def test_process_exception_handling(self, mock_chat):
         """Test exception handling in process method"""
-        from agent.llm_agent import LLMAgent
-        
-        mock_model = MagicMock()
-        mock_model_class.return_value = mock_model
-        
-        mock_chat = MagicMock()
-        mock_model.start_chat.return_value = mock_chat
         
         # Mock exception
-        mock_chat.send_message.side_effect = Exception("Network error")
+        mock_chat.send_message.side_effect = _NET_ERR
         
         agent = LLMAgent(api_key="test_key", enable_calendar=False)
         response = agent.process("user1", "test")
@@ -299,25 +377,12 @@ class TestLLMAgentErrorHandling:
 class TestLLMAgentConversation:
     """Test conversation management"""
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    def test_multi_turn_conversation(self, mock_model_class, mock_configure):
+    def test_multi_turn_conversation(self, mock_chat):
         """Test that conversation history is maintained"""
-        from agent.llm_agent import LLMAgent
-        
-        mock_model = MagicMock()
-        mock_model_class.return_value = mock_model
-        
-        mock_chat = MagicMock()
-        mock_model.start_chat.return_value = mock_chat
         
         # Mock responses
-        mock_response = MagicMock()
-        mock_part = MagicMock()
-        mock_part.text = "Response"
-        mock_part.function_call = None
-        mock_response.parts = [mock_part]
-        mock_response.text = "Response"
+        mock_part = SimpleNamespace(text="Response", function_call=None)
+        mock_response = SimpleNamespace(parts=[mock_part], text="Response")
         mock_chat.send_message.return_value = mock_response
         
         agent = LLMAgent(api_key="test_key", enable_calendar=False)
@@ -335,11 +400,81 @@ class TestLLMAgentConversation:
         assert "user2" in agent.chat_sessions
         assert len(agent.chat_sessions) == 2
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    def test_clear_history(self, mock_model_class, mock_configure):
+    def test_same_user_turns_are_serialized(self, mock_model_class, mock_chat):
+        """Test concurrent messages from one user never hit the session at once"""
+        
+        mock_model = mock_model_class.return_value
+        active = []
+        overlaps = []
+        
+        def send_message(message):
+            active.append(message)
+            overlaps.append(len(active))
+            time.sleep(0.02)
+            active.remove(message)
+            mock_part = SimpleNamespace(text="ok")
+            mock_response = SimpleNamespace(parts=[mock_part])
+            return mock_response
+        
+        mock_chat.send_message.side_effect = send_message
+        
+        agent = LLMAgent(api_key="test_key", enable_calendar=False)
+        threads = [
+            threading.Thread(target=agent.process, args=("user1", f"pesan {i}"))
+            for i in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert len(overlaps) == 4
+        assert max(overlaps) == 1
+        assert mock_model.start_chat.call_count == 1
+    
+    def test_session_eviction_is_logged(self, caplog, monkeypatch):
+        """Test least recently used sessions are dropped and logged"""
+        
+        monkeypatch.setattr('agent.llm_agent.MAX_SESSIONS', 1)
+        monkeypatch.setattr('agent.llm_agent.SESSION_SHARDS', 1)
+        agent = LLMAgent(api_key="test_key", enable_calendar=False)
+        
+        with caplog.at_level(logging.INFO, logger="agent.llm_agent"):
+            agent._get_chat("user1")
+            agent._get_chat("user2")
+        
+        assert "user1" not in agent.chat_sessions
+        assert "user2" in agent.chat_sessions
+        assert "evicted: user1" in caplog.text
+    
+    def test_history_trimmed_at_user_turn(self, monkeypatch):
+        """Test old history is dropped without splitting a function call/response pair"""
+        
+        def content(role, text=""):
+            return SimpleNamespace(role=role, parts=[SimpleNamespace(text=text)])
+        
+        history = [
+            content('user', "halo"), content('model', "hai"),
+            content('user', "jadwal besok?"), content('model'),   # function_call
+            content('user'), content('model', "Kosong"),          # function_response
+            content('user', "makasih"), content('model', "sama-sama"),
+        ]
+        chat = MagicMock()
+        chat.history = history
+        
+        agent = LLMAgent(api_key="test_key", enable_calendar=False)
+        monkeypatch.setattr('agent.llm_agent.MAX_HISTORY_MESSAGES', 5)
+        agent._trim_history(chat)
+        
+        # Cut at index 3 would orphan the function_call; it moves forward to "makasih"
+        assert chat.history == history[6:]
+        
+        chat.history = history[:4]
+        agent._trim_history(chat)
+        assert chat.history == history[:4]
+    
+    def test_clear_history(self, mock_model_class):
         """Test clearing conversation history"""
-        from agent.llm_agent import LLMAgent
         
         mock_model = MagicMock()
         mock_model_class.return_value = mock_model
@@ -351,27 +486,480 @@ class TestLLMAgentConversation:
         
         assert "user1" not in agent.chat_sessions
         assert "cleared" in result.lower()
+    
+    def test_sessions_survive_save_and_load(self, mock_model_class, tmp_path):
+        """Test saved histories are restored on the user's next turn"""
+        
+        mock_model = MagicMock()
+        mock_model_class.return_value = mock_model
+        path = str(tmp_path / "sessions.json")
+        
+        chat = SimpleNamespace(
+            history=[
+                genai.protos.Content(role='user', parts=[genai.protos.Part(text="halo")]),
+                genai.protos.Content(role='model', parts=[genai.protos.Part(text="hai")]),
+            ],
+        )
+        agent = LLMAgent(api_key="test_key", enable_calendar=False)
+        agent.chat_sessions['user1'] = chat
+        assert agent.save_sessions(path) == 1
+        
+        restarted = LLMAgent(api_key="test_key", enable_calendar=False)
+        assert restarted.load_sessions(path) == 1
+        mock_model.start_chat.reset_mock()
+        restarted._get_chat('user1')
+        
+        history = mock_model.start_chat.call_args.kwargs['history']
+        assert [h['role'] for h in history] == ['user', 'model']
+        assert history[1]['parts'] == [{'text': "hai"}]
+    
+    def test_stale_sessions_not_loaded(self, tmp_path):
+        """Test a sessions file older than SESSION_TTL is ignored"""
+        
+        path = tmp_path / "sessions.json"
+        path.write_text(json.dumps({'saved_at': 0, 'sessions': {'user1': []}}))
+        
+        agent = LLMAgent(api_key="test_key", enable_calendar=False)
+        
+        assert agent.load_sessions(str(path)) == 0
+        assert agent.load_sessions(str(tmp_path / "missing.json")) == 0
+
+
+class TestLLMAgentStreaming:
+    """Test streamed chat responses"""
+    
+    @staticmethod
+    def _text_chunk(text):
+        part = SimpleNamespace(text=text, function_call=None)
+        chunk = SimpleNamespace(parts=[part])
+        return chunk
+    
+    def test_chat_stream_yields_chunks(self, mock_chat, make_llm_agent):
+        """Test text chunks are yielded as they arrive"""
+        
+        mock_response = MagicMock()
+        mock_response.__iter__.return_value = iter([
+            self._text_chunk("Halo, "),
+            self._text_chunk("apa kabar?")
+        ])
+        mock_response.parts = []
+        mock_chat.send_message.return_value = mock_response
+        
+        agent = make_llm_agent()
+        chunks = list(agent.chat_stream("user1", "Hello"))
+        
+        assert chunks == ["Halo, ", "apa kabar?"]
+        mock_chat.send_message.assert_called_once_with("Hello", stream=True)
+    
+    @patch('agent.tools.calendar_tools.list_calendar_events')
+    def test_chat_stream_with_function_call(self, mock_list, mock_chat, make_llm_agent):
+        """Test tool calls in a stream are executed and the final reply is yielded"""
+        
+        mock_list.return_value = {'success': True, 'events': [], 'message': 'Tidak ada event'}
+        
+        # Streamed response carrying a function call
+        mock_fc = SimpleNamespace(name="list_calendar_events", args={"days": 7})
+        mock_fc_part = SimpleNamespace(function_call=mock_fc, text=None)
+        
+        mock_stream = MagicMock()
+        mock_stream.__iter__.return_value = iter([])
+        mock_stream.parts = [mock_fc_part]
+        
+        # Final reply is streamed too
+        mock_final = MagicMock()
+        mock_final.__iter__.return_value = iter([
+            self._text_chunk("Tidak ada event "),
+            self._text_chunk("minggu ini")
+        ])
+        
+        mock_chat.send_message.side_effect = [mock_stream, mock_final]
+        
+        agent = make_llm_agent()
+        chunks = list(agent.chat_stream("user1", "Jadwal minggu ini?"))
+        
+        assert chunks == ["Tidak ada event ", "minggu ini"]
+        mock_list.assert_called_once_with(days=7)
+        assert mock_chat.send_message.call_args.kwargs == {'stream': True}
+    
+    @patch('agent.tools.calendar_tools.add_calendar_event')
+    def test_process_stream_falls_back_to_tool_message(self, mock_add, mock_chat, make_llm_agent):
+        """Test the tool result message is yielded when the final stream is empty"""
+        
+        mock_add.return_value = {'success': True, 'message': '✅ Event created!'}
+        
+        mock_fc = SimpleNamespace(
+            name="add_calendar_event",
+            args={"title": "Rapat", "date": "2025-10-30", "time": "14:00"},
+        )
+        mock_fc_part = SimpleNamespace(function_call=mock_fc)
+        mock_stream = MagicMock()
+        mock_stream.__iter__.return_value = iter([])
+        mock_stream.parts = [mock_fc_part]
+        
+        mock_final = MagicMock()
+        mock_final.__iter__.return_value = iter([])
+        mock_chat.send_message.side_effect = [mock_stream, mock_final]
+        
+        agent = make_llm_agent()
+        chunks = list(agent.process_stream("user1", "rapat besok jam 2"))
+        
+        assert chunks == ['✅ Event created!']
+    
+    def test_chat_stream_error(self, mock_chat, make_llm_agent):
+        """Test stream errors are yielded as an error message"""
+        
+        mock_chat.send_message.side_effect = _NET_ERR
+        
+        agent = make_llm_agent()
+        chunks = list(agent.chat_stream("user1", "test"))
+        
+        assert len(chunks) == 1
+        assert "Error" in chunks[0]
+    
+    @patch('agent.tools.calendar_tools.list_calendar_events')
+    async def test_chat_stream_async_with_function_call(self, mock_list, mock_chat, make_llm_agent):
+        """Test the async stream runs tool calls and streams the final reply"""
+        
+        mock_list.return_value = {'success': True, 'events': [], 'message': 'Tidak ada event'}
+        
+        mock_fc = SimpleNamespace(name="list_calendar_events", args={"days": 7})
+        mock_fc_part = SimpleNamespace(function_call=mock_fc, text=None)
+        mock_stream = MagicMock()
+        mock_stream.__aiter__.return_value = []
+        mock_stream.parts = [mock_fc_part]
+        
+        mock_final = MagicMock()
+        mock_final.__aiter__.return_value = [
+            self._text_chunk("Tidak ada event "),
+            self._text_chunk("minggu ini")
+        ]
+        mock_chat.send_message_async = AsyncMock(side_effect=[mock_stream, mock_final])
+        
+        agent = make_llm_agent()
+        chunks = [c async for c in agent.chat_stream_async("user1", "Jadwal minggu ini?")]
+        
+        assert chunks == ["Tidak ada event ", "minggu ini"]
+        mock_list.assert_called_once_with(days=7)
+        mock_chat.send_message.assert_not_called()
+
+    
+    async def test_stream_stopped_early_frees_slot(self, mock_chat, make_llm_agent):
+        """Test a suspended stream holds no semaphore slot and aclose() frees its user"""
+        
+        mock_stream = MagicMock()
+        mock_stream.__aiter__.return_value = [self._text_chunk("Halo "), self._text_chunk("lagi")]
+        mock_stream.parts = []
+        mock_reply = SimpleNamespace(parts=[SimpleNamespace(text="Hai!", function_call=None)])
+        mock_chat.send_message_async = AsyncMock(side_effect=[mock_stream, mock_reply, mock_reply])
+        
+        with patch('agent.llm_agent.MAX_CONCURRENT_REQUESTS', 1):
+            agent = make_llm_agent()
+        
+        stream = agent.aprocess_stream("user1", "Hello")
+        assert await stream.__anext__() == "Halo "
+        
+        # The consumer is paused mid-stream: other users still get the only slot
+        assert await asyncio.wait_for(agent.aprocess("user2", "Hi"), timeout=1) == "Hai!"
+        
+        await stream.aclose()
+        assert await asyncio.wait_for(agent.aprocess("user1", "Hi"), timeout=1) == "Hai!"
+
+class TestLLMAgentAsync:
+    """Test async processing"""
+    
+    async def test_aprocess_text_response(self, mock_chat, make_llm_agent):
+        """Test aprocess awaits send_message_async"""
+        
+        mock_part = SimpleNamespace(text="Halo!", function_call=None)
+        mock_response = SimpleNamespace(parts=[mock_part])
+        mock_chat.send_message_async = AsyncMock(return_value=mock_response)
+        
+        agent = make_llm_agent()
+        response = await agent.aprocess("user1", "Hello")
+        
+        assert response == "Halo!"
+        mock_chat.send_message_async.assert_awaited_once_with("Hello")
+        mock_chat.send_message.assert_not_called()
+    
+    @patch('agent.tools.calendar_tools.list_calendar_events')
+    async def test_aprocess_runs_all_function_calls(self, mock_list, mock_chat, make_llm_agent):
+        """Test every tool call runs and results go back in one message"""
+        
+        mock_list.return_value = {'success': True, 'events': [], 'message': 'Kosong'}
+        
+        fc_parts = []
+        for day in ('2025-10-30', '2025-10-31'):
+            mock_fc = MagicMock()
+            mock_fc.name = "list_calendar_events"
+            mock_fc.args = {"date": day}
+            mock_fc_part = MagicMock()
+            mock_fc_part.function_call = mock_fc
+            fc_parts.append(mock_fc_part)
+        mock_fc_response = SimpleNamespace(parts=fc_parts)
+        
+        mock_final_part = SimpleNamespace(text="Dua hari kosong")
+        mock_final = SimpleNamespace(parts=[mock_final_part])
+        
+        mock_chat.send_message_async = AsyncMock(side_effect=[mock_fc_response, mock_final])
+        
+        agent = make_llm_agent()
+        response = await agent.aprocess("user1", "jadwal kamis dan jumat?")
+        
+        assert response == "Dua hari kosong"
+        assert mock_list.call_count == 2
+        sent_parts = mock_chat.send_message_async.await_args_list[1].args[0]
+        assert len(sent_parts) == 2
+    
+    async def test_chat_async_orders_turns_per_user(self, mock_model_class, make_llm_agent):
+        """Test one user's turns run in order while other users overlap"""
+        
+        mock_model = MagicMock()
+        mock_model_class.return_value = mock_model
+        chats = {}
+        mock_model.start_chat.side_effect = lambda history: chats.setdefault(len(chats), MagicMock())
+        
+        active = {}
+        peak = {'same_user': 0, 'total': 0}
+        
+        def make_chat_send(user):
+            async def send_message_async(message, **kwargs):
+                active[user] = active.get(user, 0) + 1
+                peak['same_user'] = max(peak['same_user'], active[user])
+                peak['total'] = max(peak['total'], sum(active.values()))
+                await asyncio.sleep(0.01)
+                active[user] -= 1
+                mock_part = SimpleNamespace(text="ok", function_call=None)
+                mock_response = SimpleNamespace(parts=[mock_part])
+                return mock_response
+            return send_message_async
+        
+        agent = make_llm_agent()
+        for user in ("user1", "user2"):
+            agent._get_chat(user).send_message_async = make_chat_send(user)
+        
+        replies = await asyncio.gather(
+            agent.chat_async("user1", "a"),
+            agent.chat_async("user1", "b"),
+            agent.chat_async("user2", "c"),
+        )
+        
+        assert replies == ["ok", "ok", "ok"]
+        assert peak['same_user'] == 1
+        assert peak['total'] == 2
+    
+    async def test_aprocess_error(self, mock_chat, make_llm_agent):
+        """Test async errors are returned as a message"""
+        
+        mock_chat.send_message_async = AsyncMock(side_effect=Exception("Network error"))
+        
+        agent = make_llm_agent()
+        response = await agent.aprocess("user1", "test")
+        
+        assert "Error" in response
+
+
+class TestLLMAgentParallelTools:
+    """Test parallel execution of independent tool calls"""
+    
+    def test_can_run_parallel(self):
+        """Test read/write hazard detection"""
+        
+        list_today = {'name': 'list_calendar_events', 'args': {'date': '2025-10-30'}}
+        list_tomorrow = {'name': 'list_calendar_events', 'args': {'date': '2025-10-31'}}
+        delete_a = {'name': 'delete_calendar_event', 'args': {'event_id': 'a'}}
+        delete_b = {'name': 'delete_calendar_event', 'args': {'event_id': 'b'}}
+        update_a = {'name': 'update_calendar_event', 'args': {'event_id': 'a', 'title': 'X'}}
+        
+        assert _can_run_parallel([list_today, list_tomorrow])
+        assert _can_run_parallel([delete_a, delete_b])
+        assert not _can_run_parallel([delete_a, list_today])
+        assert not _can_run_parallel([update_a, delete_a])
+        
+        # Batch tools conflict with any other write on one of their events
+        delete_ab = {'name': 'delete_calendar_events', 'args': {'event_ids': ['a', 'b']}}
+        update_many = {'name': 'update_calendar_events', 'args': {'updates': [{'event_id': 'c'}]}}
+        assert not _can_run_parallel([delete_ab, update_a])
+        assert _can_run_parallel([delete_ab, update_many])
+    
+    def test_independent_calls_run_concurrently(self, llm_agent_nocal):
+        """Test reads overlap in time and results keep call order"""
+        
+        barrier = threading.Barrier(2, timeout=2)
+        
+        def fake_execute(fc_dict):
+            barrier.wait()  # Deadlocks (times out) unless both run at once
+            return {'date': fc_dict['args']['date']}
+        
+        calls = [
+            {'name': 'list_calendar_events', 'args': {'date': '2025-10-30'}},
+            {'name': 'list_calendar_events', 'args': {'date': '2025-10-31'}},
+        ]
+        with patch.object(llm_agent_nocal, '_execute_function', side_effect=fake_execute):
+            results = llm_agent_nocal._run_function_calls(calls)
+        
+        assert results == [{'date': '2025-10-30'}, {'date': '2025-10-31'}]
+    
+    def test_dependent_calls_run_in_order(self, llm_agent_nocal):
+        """Test a delete followed by a list runs sequentially"""
+        
+        order = []
+        
+        calls = [
+            {'name': 'delete_calendar_event', 'args': {'event_id': 'a'}},
+            {'name': 'list_calendar_events', 'args': {}},
+        ]
+        with patch.object(llm_agent_nocal, '_execute_function', side_effect=lambda fc: order.append(fc['name'])):
+            llm_agent_nocal._run_function_calls(calls)
+        
+        assert order == ['delete_calendar_event', 'list_calendar_events']
+
+
+class TestLLMAgentSpeculation:
+    """Test prefetching of predictable read-only tool calls"""
+    
+    @staticmethod
+    def _fc_response(name, args):
+        mock_fc = SimpleNamespace(name=name, args=args)
+        mock_fc_part = SimpleNamespace(function_call=mock_fc)
+        mock_response = SimpleNamespace(parts=[mock_fc_part])
+        return mock_response
+    
+    @staticmethod
+    def _text_response(text):
+        mock_part = SimpleNamespace(text=text)
+        mock_response = SimpleNamespace(parts=[mock_part])
+        return mock_response
+    
+    @patch('agent.tools.calendar_tools.list_calendar_events')
+    def test_learned_read_is_prefetched(self, mock_list, mock_chat, make_llm_agent):
+        """Test a recurring prompt's read runs once per turn, via the prefetch"""
+        
+        mock_list.return_value = {'success': True, 'events': [], 'message': 'Kosong'}
+        
+        turns = SPECULATION_MIN_SAMPLES + 1
+        mock_chat.send_message.side_effect = [
+            self._fc_response("list_calendar_events", {"date": "2025-10-30"}),
+            self._text_response("Kosong"),
+        ] * turns
+        
+        agent = make_llm_agent()
+        speculate = agent._speculate
+        predictions = []
+        
+        def record(pattern_key):
+            prefetched = speculate(pattern_key)
+            predictions.append(prefetched is not None)
+            return prefetched
+        
+        with patch.object(agent, '_speculate', side_effect=record):
+            for _ in range(turns):
+                assert agent.process("user1", "apa jadwalku hari ini") == "Kosong"
+        
+        # Only the last turn had enough history to predict, and the read ran once per turn
+        assert predictions == [False] * SPECULATION_MIN_SAMPLES + [True]
+        assert mock_list.call_count == turns
+        mock_list.assert_called_with(date="2025-10-30")
+    
+    def test_writes_are_never_prefetched(self, make_llm_agent):
+        """Test mutations are not predicted even when they recur"""
+        
+        agent = make_llm_agent()
+        key = ("user1", "hapus meeting")
+        for _ in range(SPECULATION_MIN_SAMPLES + 2):
+            agent._record_tool_pattern(key, [{'name': 'delete_calendar_event', 'args': {'event_id': 'a'}}])
+        
+        assert agent._speculate(key) is None
+    
+    def test_dates_are_learned_relative_to_today(self, make_llm_agent):
+        """Test a daily prompt predicts the new day's date, not the one it was learned on"""
+        
+        agent = make_llm_agent()
+        key = ("user1", "apa jadwalku hari ini")
+        agent._prompt_date = date(2025, 10, 30)
+        for _ in range(SPECULATION_MIN_SAMPLES):
+            agent._record_tool_pattern(key, [{'name': 'list_calendar_events', 'args': {'date': '2025-10-30'}}])
+        
+        agent._prompt_date = date(2025, 10, 31)
+        with patch.object(agent, '_execute_function', return_value={'success': True}) as mock_exec:
+            _, predicted, future = agent._speculate(key)
+            assert future.result() == {'success': True}
+        
+        expected = {'name': 'list_calendar_events', 'args': {'date': '2025-10-31'}}
+        mock_exec.assert_called_once_with(expected)
+        assert predicted == _call_key(expected)
+    
+    def test_mismatched_prefetch_is_discarded(self, make_llm_agent):
+        """Test the real call runs when the model picks different args, and the prompt stops prefetching"""
+        
+        agent = make_llm_agent()
+        key = ("user1", "apa jadwalku")
+        for _ in range(SPECULATION_MIN_SAMPLES):
+            agent._record_tool_pattern(key, [{'name': 'list_calendar_events', 'args': {}}])
+        
+        stale = Future()
+        predicted = _call_key({'name': 'list_calendar_events', 'args': {'date': '2025-10-30'}})
+        actual = [{'name': 'list_calendar_events', 'args': {'date': '2025-10-31'}}]
+        
+        with patch.object(agent, '_execute_function', return_value={'success': True}) as mock_exec:
+            results = agent._resolve_function_calls(actual, (key, predicted, stale))
+        
+        assert results == [{'success': True}]
+        mock_exec.assert_called_once_with(actual[0])
+        assert stale.cancelled()
+        assert agent._speculate(key) is None
+
+
+class TestLLMAgentToolRouting:
+    """Test tools are disabled for greetings / thanks only"""
+    
+    def test_send_kwargs(self):
+        """Test which messages keep function calling enabled"""
+        
+        with patch('agent.llm_agent.LLMAgent._setup_calendar_tools'):
+            agent = LLMAgent(api_key="test_key", enable_calendar=True)
+        
+        assert agent._send_kwargs("user1", "halo, makasih ya!") == {'tool_config': NO_TOOLS_CONFIG}
+        assert agent._send_kwargs("user1", "apa jadwalku hari ini?") == {}
+        assert agent._send_kwargs("user1", "Tambahkan rapat jam 3") == {}
+        assert agent._send_kwargs("user1", "x" * 200) == {}
+        
+        # Short calendar requests without obvious keywords keep tools on
+        for message in ("what's on tomorrow?", "delete it", "add lunch at 12",
+                        "show my day", "nanti sore ada apa?", "jam 3 pagi"):
+            assert agent._send_kwargs("user1", message) == {}
+        
+        # A follow-up to a tool turn keeps tools available
+        agent._note_tool_use("user1", [{'name': 'list_calendar_events', 'args': {}}])
+        assert agent._send_kwargs("user1", "oke") == {}
+        agent._note_tool_use("user1", [])
+        assert agent._send_kwargs("user1", "oke") == {'tool_config': NO_TOOLS_CONFIG}
+    
+    def test_process_passes_tool_config(self, mock_chat):
+        """Test process sends chit-chat with function calling disabled"""
+        
+        mock_part = SimpleNamespace(text="Sama-sama!", function_call=None)
+        mock_response = SimpleNamespace(parts=[mock_part])
+        mock_chat.send_message.return_value = mock_response
+        
+        with patch('agent.llm_agent.LLMAgent._setup_calendar_tools'):
+            agent = LLMAgent(api_key="test_key", enable_calendar=True)
+        
+        assert agent.process("user1", "makasih") == "Sama-sama!"
+        mock_chat.send_message.assert_called_once_with("makasih", tool_config=NO_TOOLS_CONFIG)
 
 
 class TestLLMAgentUtilities:
     """Test utility methods"""
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    def test_get_help(self, mock_model_class, mock_configure):
+    def test_get_help(self, llm_agent_nocal):
         """Test get_help method"""
-        from agent.llm_agent import LLMAgent
         
-        agent = LLMAgent(api_key="test_key", enable_calendar=False)
-        help_text = agent.get_help()
+        help_text = llm_agent_nocal.get_help()
         
         assert "help" in help_text.lower() or "bot" in help_text.lower()
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    def test_get_stats(self, mock_model_class, mock_configure):
+    def test_get_stats(self):
         """Test get_stats method"""
-        from agent.llm_agent import LLMAgent
         
         agent = LLMAgent(api_key="test_key", enable_calendar=True)
         agent.chat_sessions = {'user1': MagicMock(), 'user2': MagicMock()}
@@ -382,31 +970,110 @@ class TestLLMAgentUtilities:
         assert "gemini" in stats.lower()
 
 
+class TestLLMAgentIntentParsing:
+    """Test parse_calendar_intent (!cal commands)"""
+    
+    def _reply(self, mock_model_class, text):
+        mock_model_class.return_value.generate_content.return_value = SimpleNamespace(
+            parts=[SimpleNamespace(text=text, function_call=None)], text=text
+        )
+    
+    def test_parses_json_intent(self, mock_model_class, make_llm_agent):
+        """A JSON reply with a known action is returned as a dict"""
+        self._reply(mock_model_class, '{"action": "delete", "event_id": "abc123"}')
+        agent = make_llm_agent()
+        
+        intent = agent.parse_calendar_intent("hapus event abc123")
+        
+        assert intent == {'action': 'delete', 'event_id': 'abc123'}
+        mock_model_class.return_value.generate_content.assert_called_with("hapus event abc123")
+    
+    def test_prompt_carries_today(self, mock_model_class, make_llm_agent):
+        """The intent prompt resolves "besok" against today's date"""
+        self._reply(mock_model_class, '{"action": "read", "date": null, "days": 7}')
+        agent = make_llm_agent()
+        
+        agent.parse_calendar_intent("jadwal minggu ini")
+        
+        kwargs = mock_model_class.call_args.kwargs
+        assert date.today().isoformat() in kwargs['system_instruction']
+        assert kwargs['generation_config'] == {'response_mime_type': 'application/json'}
+        assert 'tools' not in kwargs
+    
+    @pytest.mark.parametrize("text", ["bukan json", '{"action": null}', '{"action": "explode"}', '[]'])
+    def test_unparseable_reply_returns_none(self, mock_model_class, make_llm_agent, text):
+        """Invalid JSON or an unknown action yields None"""
+        self._reply(mock_model_class, text)
+        agent = make_llm_agent()
+        
+        assert agent.parse_calendar_intent("asdf") is None
+    
+    def test_api_error_returns_none(self, mock_model_class, make_llm_agent):
+        """A failed Gemini call yields None instead of raising"""
+        mock_model_class.return_value.generate_content.side_effect = _NET_ERR
+        agent = make_llm_agent()
+        
+        assert agent.parse_calendar_intent("tambah meeting besok") is None
+
+
 class TestCalendarToolsIntegration:
     """Test CALENDAR_TOOLS integration with LLM"""
     
-    @patch('google.generativeai.configure')
-    @patch('google.generativeai.GenerativeModel')
-    def test_tools_loaded_correctly(self, mock_model_class, mock_configure):
+    def test_tools_loaded_correctly(self):
         """Test that calendar tools are loaded correctly"""
-        from agent.llm_agent import LLMAgent
-        from agent.tools.calendar_tools import CALENDAR_TOOLS
         
-        with patch('agent.llm_agent.LLMAgent._setup_calendar_tools') as mock_setup:
-            mock_tools = [MagicMock()]
-            mock_setup.return_value = mock_tools
-            
+        mock_tools = [MagicMock()]
+        with patch.object(LLMAgent, '_setup_calendar_tools', return_value=mock_tools) as mock_setup:
             agent = LLMAgent(api_key="test_key", enable_calendar=True)
-            
-            assert agent.tools == mock_tools
-            mock_setup.assert_called_once()
+        
+        assert agent.tools == mock_tools
+        mock_setup.assert_called_once()
     
-    def test_calendar_tools_have_required_fields(self):
+    @pytest.mark.parametrize("field", ['name', 'description', 'parameters'])
+    def test_calendar_tools_have_required_fields(self, calendar_tool_decls, field):
         """Test that CALENDAR_TOOLS have all required fields"""
-        from agent.tools.calendar_tools import CALENDAR_TOOLS
         
-        required_fields = ['name', 'description', 'parameters']
+        for name, tool in calendar_tool_decls.items():
+            assert field in tool, f"Tool {name} missing {field}"
+    
+    @patch('agent.calendar_agent.CalendarAgent')
+    def test_calendar_agent_initialized_once_under_race(self, mock_agent_class, monkeypatch):
+        """Test concurrent first calls construct a single CalendarAgent"""
+        
+        barrier = threading.Barrier(8)
         
-        for tool in CALENDAR_TOOLS:
-            for field in required_fields:
-                assert field in tool, f"Tool {tool.get('name')} missing {field}"
\ No newline at end of file
+        def first_call():
+            barrier.wait()
+            calendar_tools.get_calendar_agent()
+        
+        monkeypatch.setattr(calendar_tools, '_calendar_agent', None)
+        threads = [threading.Thread(target=first_call) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert calendar_tools.get_calendar_agent() is mock_agent_class.return_value
+        mock_agent_class.assert_called_once()
+    
+    @patch('agent.calendar_agent.CalendarAgent')
+    def test_init_calendar_agent_is_idempotent(self, mock_agent_class, caplog, monkeypatch):
+        """Test a second init reuses the agent instead of re-authenticating"""
+        
+        monkeypatch.setattr(calendar_tools, '_calendar_agent', None)
+        monkeypatch.setattr(calendar_tools, '_calendar_agent_paths', None)
+        first = calendar_tools.init_calendar_agent()
+        with caplog.at_level('INFO', logger='agent.tools.calendar_tools'):
+            second = calendar_tools.init_calendar_agent()
+        
+        assert first is second
+        mock_agent_class.assert_called_once()
+        assert 'Reusing existing CalendarAgent (credentials/credentials.json / credentials/token.json)' in caplog.text
+        
+        # Different paths can't be honored - they are reported, not silently dropped
+        with caplog.at_level('WARNING', logger='agent.tools.calendar_tools'):
+            third = calendar_tools.init_calendar_agent(token_path='other/token.json')
+        
+        assert third is first
+        mock_agent_class.assert_called_once()
+        assert "ignoring credentials/credentials.json / other/token.json" in caplog.records[-1].getMessage()